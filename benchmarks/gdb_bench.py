@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- encoding UTF-8 -*-
+"""
+gdb side of the benchmark suite.
+
+Run as "gdb -batch -nx -x gdb_bench.py <workload>" by run.py, which passes
+its settings through the environment:
+
+BENCH_OUTPUT   JSON file to write the measurements to.
+BENCH_TRACK    "1" to install the allocation tracking breakpoints (operator
+               new[], malloc, calloc, realloc and free) before running the
+               workload.
+BENCH_READER   "1" to read memory through procmem.ProcessMemory.
+BENCH_REPEAT   number of times to repeat the snapshot; the best is kept.
+
+The workload is stopped in snapshot_here() and its caller is snapshotted.
+The timed snapshots run with instrumentation off; one more snapshot is then
+taken with it on, and its counters are reported under "instrument" along
+with the tracking breakpoint stop costs.
+"""
+
+import json
+import os
+import sys
+import time
+import gdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "src", "search"))
+
+import data
+import disassembly
+import procmem
+from instrument import recorder
+
+# gdb entry points the search goes through.  Value methods cannot be wrapped,
+# so this undercounts, but it moves whenever the number of lookups does.
+_COUNTED = ("execute", "parse_and_eval", "lookup_type", "lookup_symbol",
+            "lookup_global_symbol", "lookup_static_symbol", "block_for_pc",
+            "find_pc_line", "selected_frame", "newest_frame",
+            "selected_inferior", "selected_thread")
+
+
+class CallCounter(object):
+
+    def __init__(self, names=_COUNTED):
+        self.calls = dict()
+        self._original = dict()
+        for name in names:
+            if hasattr(gdb, name):
+                self._original[name] = getattr(gdb, name)
+
+    def _wrap(self, name, function):
+        def counted(*args, **kwargs):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return function(*args, **kwargs)
+        return counted
+
+    def __enter__(self):
+        self.calls = dict()
+        for name, function in self._original.items():
+            setattr(gdb, name, self._wrap(name, function))
+        return self
+
+    def __exit__(self, type, value, tb):
+        for name, function in self._original.items():
+            setattr(gdb, name, function)
+
+    def total(self):
+        return sum(self.calls.values())
+
+
+class CountingGraph(data.MemoryGraph):
+    """
+    MemoryGraph which counts the raw reads it makes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CountingGraph, self).__init__(*args, **kwargs)
+        self.reads = 0
+        self.bytesRead = 0
+
+    def _read_memory(self, address, length):
+        self.reads += 1
+        self.bytesRead += length
+        return super(CountingGraph, self)._read_memory(address, length)
+
+
+def run_to_snapshot(track):
+    """
+    Start the workload and stop in the caller of snapshot_here().
+
+    @return {float} seconds from "run" to the stop.
+    """
+    breaks = data.track_allocations() if track else list()
+    gdb.execute("break snapshot_here", to_string=True)
+    start = time.time()
+    gdb.execute("run", to_string=True)
+    elapsed = time.time() - start
+    for breakpoint in breaks:
+        breakpoint.enabled = False
+    gdb.execute("up", to_string=True)
+    return elapsed
+
+
+def snapshot(useReader):
+    reader = None
+    if useReader:
+        reader = procmem.ProcessMemory(gdb.selected_inferior().pid)
+    graph = CountingGraph(frameCache=data.FrameCache(), reader=reader)
+    with CallCounter() as counter:
+        start = time.time()
+        graph.search()
+        elapsed = time.time() - start
+    vertices = graph._network.num_vertices()
+    result = {
+        "seconds": elapsed,
+        "vertices": vertices,
+        "edges": graph._network.num_edges(),
+        "verticesPerSecond": vertices / elapsed if elapsed > 0 else 0.0,
+        "reads": graph.reads,
+        # Reads through the reader go through _read_memory and are counted
+        # there too.
+        "bytesRead": graph.bytesRead,
+        "gdbCalls": counter.total(),
+        "gdbCallsByName": counter.calls,
+    }
+    if reader is not None:
+        reader.close()
+    return result
+
+
+def instrumented(useReader):
+    recorder.enable()
+    snapshot(useReader)
+    recorder.disable()
+    result = recorder.as_dict()
+    queue = result.pop("queue")
+    result["queuePeak"] = queue["peak"]
+    result["queueMean"] = queue["mean"]
+    result["queueSamples"] = queue["samples"]
+    return result
+
+
+def block_graph():
+    with CallCounter() as counter:
+        start = time.time()
+        graph = disassembly.BlockGraph()
+        elapsed = time.time() - start
+    return {
+        "seconds": elapsed,
+        "vertices": graph._network.num_vertices(),
+        "gdbCalls": counter.total(),
+    }
+
+
+def main():
+    track = os.environ.get("BENCH_TRACK") == "1"
+    repeat = max(int(os.environ.get("BENCH_REPEAT", "1")), 1)
+    useReader = os.environ.get("BENCH_READER") == "1"
+    recorder.enable()
+    result = {"stopSeconds": run_to_snapshot(track)}
+    recorder.disable()
+    stops = recorder.as_dict()["stops"]
+    if track:
+        result["trackedBlocks"] = \
+            len(data.NewTrackingBreak.tracker.allocated)
+    runs = [snapshot(useReader) for i in range(repeat)]
+    result["search"] = min(runs, key=lambda run: run["seconds"])
+    result["instrument"] = instrumented(useReader)
+    result["instrument"]["stops"] = stops
+    result["blockGraph"] = block_graph()
+    with open(os.environ["BENCH_OUTPUT"], "w") as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+    gdb.execute("kill", to_string=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Snapshot throughput benchmarks.
+
+Each workload in workloads/ is compiled with -g -O0 and snapshotted by
+gdb_bench.py under batch-mode gdb.  The measurements of every workload, plus
+the peak RSS of its gdb process, are written to one JSON file.  Given a
+baseline written by an earlier run, metrics which moved the wrong way by more
+than the tolerance are reported and the exit status is 1.
+
+    python benchmarks/run.py -o results.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json
+
+This module runs outside of gdb and does not import it.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WORKLOADS = os.path.join(HERE, "workloads")
+BENCH_SCRIPT = os.path.join(HERE, "gdb_bench.py")
+
+_COMPILERS = {".c": "gcc", ".cpp": "g++"}
+
+# Metric path -> True if larger is better.
+METRICS = {
+    ("search", "verticesPerSecond"): True,
+    ("search", "bytesRead"): False,
+    ("search", "gdbCalls"): False,
+    ("blockGraph", "seconds"): False,
+    ("stopSeconds",): False,
+    ("peakRssKiB",): False,
+    ("instrument", "calls", "read_memory"): False,
+    ("instrument", "bytes", "read_memory"): False,
+    ("instrument", "calls", "symbol_value"): False,
+    ("instrument", "queuePeak"): False,
+}
+
+
+def workloads(names=None):
+    """
+    @return {list} (name, source path) of the workloads, optionally only
+    those called names.
+    """
+    found = list()
+    for fileName in sorted(os.listdir(WORKLOADS)):
+        name, extension = os.path.splitext(fileName)
+        if extension in _COMPILERS and (not names or name in names):
+            found.append((name, os.path.join(WORKLOADS, fileName)))
+    return found
+
+
+def compile_workload(source, directory):
+    name, extension = os.path.splitext(os.path.basename(source))
+    binary = os.path.join(directory, name)
+    subprocess.check_call([os.environ.get("CC" if extension == ".c"
+                                          else "CXX", _COMPILERS[extension]),
+                           "-g", "-O0", "-o", binary, source])
+    return binary
+
+
+def run_workload(binary, output, gdb="gdb", track=False, reader=False,
+                 repeat=1):
+    """
+    Snapshot binary under batch gdb.
+
+    @return {dict} the measurements, or None if gdb failed.
+    """
+    env = dict(os.environ)
+    env["BENCH_OUTPUT"] = output
+    env["BENCH_TRACK"] = "1" if track else "0"
+    env["BENCH_READER"] = "1" if reader else "0"
+    env["BENCH_REPEAT"] = str(repeat)
+    command = [gdb, "-batch", "-nx", "-x", BENCH_SCRIPT, binary]
+    with open(output + ".log", "w") as log:
+        worker = subprocess.Popen(command, env=env, stdout=log,
+                                  stderr=subprocess.STDOUT)
+        # wait4 rather than getrusage(RUSAGE_CHILDREN), whose maximum covers
+        # every child so far.
+        _, status, usage = os.wait4(worker.pid, 0)
+        worker.returncode = os.WEXITSTATUS(status)
+    if worker.returncode != 0 or not os.path.exists(output):
+        print("gdb failed on", binary, "see", output + ".log",
+              file=sys.stderr)
+        return None
+    with open(output) as f:
+        result = json.load(f)
+    # ru_maxrss is in KiB on Linux but in bytes on macOS.
+    scale = 1024 if platform.system() == "Darwin" else 1
+    result["peakRssKiB"] = usage.ru_maxrss // scale
+    return result
+
+
+def _lookup(result, path):
+    for key in path:
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    @return {list} (workload, metric, baseline value, value) for every
+    metric which got worse than baseline by more than tolerance.
+    """
+    regressions = list()
+    for name, result in sorted(results.items()):
+        if name not in baseline or result is None:
+            continue
+        for path, higherIsBetter in sorted(METRICS.items()):
+            old = _lookup(baseline[name], path)
+            new = _lookup(result, path)
+            if not old or new is None:
+                continue
+            change = (new - old) / float(old)
+            if higherIsBetter:
+                change = -change
+            if change > tolerance:
+                regressions.append((name, ".".join(path), old, new))
+    return regressions
+
+
+def main(argv):
+    arg_parser = argparse.ArgumentParser(
+        prog=argv[0],
+        description="Benchmark MemoryGraph snapshots of small programs.")
+    arg_parser.add_argument("workloads", nargs="*",
+                            help="workloads to run (default: all)")
+    arg_parser.add_argument("-o", "--output", default="bench.json")
+    arg_parser.add_argument("--baseline",
+                            help="results of an earlier run to compare with")
+    arg_parser.add_argument("--tolerance", type=float, default=0.1,
+                            help="relative change allowed before a metric "
+                                 "counts as a regression")
+    arg_parser.add_argument("--track", action="store_true",
+                            help="install the allocation tracking "
+                                 "breakpoints")
+    arg_parser.add_argument("--reader", action="store_true",
+                            help="read memory from /proc/<pid>/mem")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--gdb", default="gdb")
+    arg_parser.add_argument("--keep", action="store_true",
+                            help="keep the build directory")
+    args = arg_parser.parse_args(args=argv[1:])
+
+    directory = tempfile.mkdtemp(prefix="memoryoracle-bench-")
+    results = dict()
+    try:
+        for name, source in workloads(args.workloads):
+            binary = compile_workload(source, directory)
+            results[name] = run_workload(binary,
+                                         os.path.join(directory,
+                                                      name + ".json"),
+                                         gdb=args.gdb, track=args.track,
+                                         reader=args.reader,
+                                         repeat=args.repeat)
+    finally:
+        if args.keep:
+            print("build directory:", directory)
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+    status = 0 if all(result is not None for result in results.values()) \
+        else 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for name, metric, old, new in compare(results, baseline,
+                                              args.tolerance):
+            print("regression:", name, metric, old, "->", new)
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,34 @@
+/* Large stack and global arrays of scalars and structs. */
+#include "bench.h"
+
+struct point {
+    double x;
+    double y;
+    int tag;
+};
+
+static int globalInts[4096];
+static struct point globalPoints[1024];
+
+int main(void)
+{
+    int localInts[2048];
+    struct point localPoints[512];
+    int i;
+    for (i = 0; i < 2048; ++i) {
+        localInts[i] = i;
+    }
+    for (i = 0; i < 512; ++i) {
+        localPoints[i].x = i;
+        localPoints[i].y = -i;
+        localPoints[i].tag = i % 7;
+    }
+    for (i = 0; i < 4096; ++i) {
+        globalInts[i] = i * 3;
+    }
+    for (i = 0; i < 1024; ++i) {
+        globalPoints[i].tag = i;
+    }
+    snapshot_here();
+    return localInts[7] + localPoints[3].tag - 10;
+}
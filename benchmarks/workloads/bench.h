@@ -0,0 +1,19 @@
+/* Every workload calls snapshot_here() once its data is built; the
+ * benchmark driver breaks there and snapshots. */
+#ifndef MEMORY_ORACLE_BENCH_H
+#define MEMORY_ORACLE_BENCH_H
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+__attribute__((noinline)) static void snapshot_here(void)
+{
+    __asm__ volatile("" ::: "memory");
+}
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif
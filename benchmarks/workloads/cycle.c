@@ -0,0 +1,30 @@
+/* Rings of heap nodes which point back at themselves. */
+#include <stdlib.h>
+#include "bench.h"
+
+struct ring {
+    struct ring *next;
+    struct ring *self;
+    char name[16];
+};
+
+int main(void)
+{
+    struct ring *rings[64];
+    int r, i;
+    for (r = 0; r < 64; ++r) {
+        struct ring *first = malloc(sizeof(*first));
+        struct ring *prev = first;
+        first->self = first;
+        for (i = 1; i < 32; ++i) {
+            struct ring *n = malloc(sizeof(*n));
+            n->self = n;
+            prev->next = n;
+            prev = n;
+        }
+        prev->next = first;
+        rings[r] = first;
+    }
+    snapshot_here();
+    return rings[0]->next->self == rings[0]->next ? 0 : 1;
+}
@@ -0,0 +1,37 @@
+// Deep recursion, one heap array per level.
+#include "bench.h"
+
+static int depth = 0;
+
+int fib(int n, int *memo)
+{
+    int *scratch = new int[4];
+    scratch[0] = n;
+    ++depth;
+    int result;
+    if (n < 2) {
+        if (depth > 20) {
+            snapshot_here();
+        }
+        result = n;
+    } else if (memo[n] >= 0) {
+        result = memo[n];
+    } else {
+        result = fib(n - 1, memo) + fib(n - 2, memo);
+        memo[n] = result;
+    }
+    --depth;
+    delete[] scratch;
+    return result;
+}
+
+int main()
+{
+    int *memo = new int[32];
+    for (int i = 0; i < 32; ++i) {
+        memo[i] = -1;
+    }
+    int result = fib(25, memo);
+    delete[] memo;
+    return result == 75025 ? 0 : 1;
+}
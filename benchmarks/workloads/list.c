@@ -0,0 +1,27 @@
+/* A singly linked list of heap nodes. */
+#include <stdlib.h>
+#include "bench.h"
+
+struct node {
+    int value;
+    struct node *next;
+};
+
+int main(void)
+{
+    struct node *head = NULL;
+    int i;
+    for (i = 0; i < 5000; ++i) {
+        struct node *n = malloc(sizeof(*n));
+        n->value = i;
+        n->next = head;
+        head = n;
+    }
+    snapshot_here();
+    while (head != NULL) {
+        struct node *next = head->next;
+        free(head);
+        head = next;
+    }
+    return 0;
+}
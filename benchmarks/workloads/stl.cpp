@@ -0,0 +1,19 @@
+// Standard containers holding strings and numbers.
+#include <map>
+#include <string>
+#include <vector>
+#include "bench.h"
+
+int main()
+{
+    std::vector<int> numbers;
+    std::vector<std::string> words;
+    std::map<int, std::string> names;
+    for (int i = 0; i < 2000; ++i) {
+        numbers.push_back(i);
+        words.push_back(std::string(i % 40 + 1, 'a' + i % 26));
+        names[i] = words.back();
+    }
+    snapshot_here();
+    return numbers.size() == names.size() ? 0 : 1;
+}
@@ -0,0 +1,38 @@
+// A balanced binary tree allocated with new.
+#include "bench.h"
+
+struct Tree {
+    int key;
+    Tree *left;
+    Tree *right;
+};
+
+Tree *build(int lo, int hi)
+{
+    if (lo > hi) {
+        return 0;
+    }
+    int mid = lo + (hi - lo) / 2;
+    Tree *t = new Tree;
+    t->key = mid;
+    t->left = build(lo, mid - 1);
+    t->right = build(mid + 1, hi);
+    return t;
+}
+
+void destroy(Tree *t)
+{
+    if (t) {
+        destroy(t->left);
+        destroy(t->right);
+        delete t;
+    }
+}
+
+int main()
+{
+    Tree *root = build(0, 4095);
+    snapshot_here();
+    destroy(root);
+    return 0;
+}
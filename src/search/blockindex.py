@@ -0,0 +1,521 @@
+#!/usr/bin/env python
+# -*- encoding UTF-8 -*-
+"""
+pc -> block and pc -> line lookups answered from sorted tables.
+
+gdb.block_for_pc and gdb.find_pc_line are asked the same questions over and
+over by the frame walk and by the disassembly mapping.  The first time a pc
+from a compilation unit is seen, every block and line table entry of that unit
+is loaded into sorted arrays, and every later lookup is a bisect.  Line
+tables are numpy arrays so that many pcs can be mapped in one searchsorted.
+
+Blocks nest, so the ranges of a unit's function blocks are cut at every block
+boundary and each resulting interval is assigned its innermost block.  A
+unit's code need not be contiguous (.text.startup, -ffunction-sections,
+COMDAT, LTO), and other units may sit inside its span, so units are found by
+these real block ranges rather than by the span of their static block.  A pc
+in no known range is looked up once with gdb.find_pc_line, and its unit is
+identified by its static block; the answer is remembered for that pc, so
+pcs with no unit at all (code without debug info) or in a gap between a
+unit's ranges are not looked up again either.  The symbols of each block are listed when
+first asked for.  Unit tables are kept in the on-disk
+debug-info cache, so a later session only has to map them back in.
+
+The whole index is thrown away whenever gdb loads a new objfile.
+"""
+
+import bisect
+import collections
+import os
+import gdb
+import numpy
+import debugcache
+
+
+LineEntry = collections.namedtuple("LineEntry", ["symtab", "line", "pc"])
+
+
+def block_key(block):
+    return (block.start, block.end, block.is_global, block.is_static)
+
+
+def unit_key(symtab):
+    """
+    @return {tuple} what identifies the compilation unit of symtab.  Every
+    symtab of a unit, headers included, shares its static block.
+    """
+    return (symtab.objfile.filename,) + block_key(symtab.static_block())
+
+
+class LineTable(object):
+    """
+    The pc -> line mapping of a compilation unit, as numpy arrays sorted by
+    pc.
+
+    Line tables of several symtabs (e.g. headers with inline functions) in
+    the same unit are merged as they are discovered.
+    """
+
+    def __init__(self):
+        self.pcs = numpy.empty(0, dtype=numpy.uint64)
+        self.lines = numpy.empty(0, dtype=numpy.int32)
+        self.files = numpy.empty(0, dtype=numpy.int32)
+        self.symtabs = list()
+        self._loaded = dict()
+
+    def __len__(self):
+        return len(self.pcs)
+
+    def has(self, symtab):
+        return symtab.filename in self._loaded
+
+    def add(self, symtab):
+        """
+        @return {numpy.ndarray} the pcs of the entries added, in line table
+        order; empty if symtab was already loaded.
+        """
+        if self.has(symtab):
+            return numpy.empty(0, dtype=numpy.uint64)
+        self._loaded[symtab.filename] = len(self.symtabs)
+        entries = list(symtab.linetable())
+        pcs = numpy.fromiter((e.pc for e in entries), numpy.uint64,
+                             len(entries))
+        lines = numpy.fromiter((e.line for e in entries), numpy.int32,
+                               len(entries))
+        files = numpy.full(len(entries), len(self.symtabs), numpy.int32)
+        self.symtabs.append(symtab)
+        merged = numpy.concatenate((self.pcs, pcs))
+        order = numpy.argsort(merged, kind="mergesort")
+        self.pcs = merged[order]
+        self.lines = numpy.concatenate((self.lines, lines))[order]
+        self.files = numpy.concatenate((self.files, files))[order]
+        # End of sequence markers (line 0) point past the code of their
+        # sequence, possibly into another unit.
+        return pcs[lines != 0]
+
+    def restore(self, pcs, lines, files, symtabs):
+        self.pcs = pcs
+        self.lines = lines
+        self.files = files
+        self.symtabs = list(symtabs)
+        self._loaded = dict((symtab.filename, i)
+                            for i, symtab in enumerate(self.symtabs))
+
+    def find(self, pc):
+        """
+        @return {LineEntry} the entry covering pc, or None.
+        """
+        i = int(numpy.searchsorted(self.pcs, pc, side="right")) - 1
+        if i < 0:
+            return None
+        return LineEntry(self.symtabs[self.files[i]], int(self.lines[i]),
+                         int(self.pcs[i]))
+
+    def find_all(self, pcs):
+        """
+        Map many pcs at once.
+
+        @param pcs {numpy.ndarray} pcs to look up, in any order.
+        @return {tuple} (lines, starts): the line of each pc and the pc of
+        the entry covering it, both 0 where pc precedes the table.
+        """
+        if not len(self.pcs):
+            return (numpy.zeros(len(pcs), dtype=numpy.int32),
+                    numpy.zeros(len(pcs), dtype=numpy.uint64))
+        i = numpy.searchsorted(self.pcs, pcs, side="right") - 1
+        found = i >= 0
+        i = numpy.maximum(i, 0)
+        return (numpy.where(found, self.lines[i], 0).astype(numpy.int32),
+                numpy.where(found, self.pcs[i], 0).astype(numpy.uint64))
+
+
+class CachedSymtab(object):
+    """
+    Stand-in for a gdb.Symtab whose line table was loaded from the on-disk
+    cache.  Only the file name is known.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+
+class UnitIndex(object):
+    """
+    Blocks, symbols and lines of one compilation unit.
+
+    Block objects and their symbol lists are fetched from gdb on first use,
+    so a unit restored from the debug-info cache costs nothing up front.
+    """
+
+    _GLOBAL = 1
+    _STATIC = 2
+    _NONE = 4
+
+    def __init__(self, symtab, cache=None):
+        staticBlock = symtab.static_block()
+        self.start = staticBlock.start
+        self.end = staticBlock.end
+        self.staticKey = block_key(staticBlock)
+        self.lines = LineTable()
+        self.blocks = dict()
+        self.symbols = dict()
+        if cache is not None:
+            name = "unit-r%x" % cache.relative(self.start)
+            stored = cache.load_arrays(name)
+            if stored is not None:
+                self._restore(stored, cache.load_json(name), cache)
+                return
+        self._scan(symtab, staticBlock)
+        if cache is not None:
+            arrays, meta = self._dump(cache)
+            cache.store(name, arrays, meta)
+
+    def _scan(self, symtab, staticBlock):
+        self.blocks[self.staticKey] = staticBlock
+        pending = [self.lines.add(symtab)]
+        while pending:
+            for pc in numpy.unique(pending.pop()):
+                try:
+                    block = gdb.block_for_pc(int(pc))
+                except RuntimeError:
+                    continue
+                if block is None or \
+                        block_key(block.static_block) != self.staticKey:
+                    continue
+                while block is not None and not block.is_static and \
+                        not block.is_global:
+                    if block_key(block) in self.blocks:
+                        break
+                    pending.append(self._collect(block))
+                    block = block.superblock
+        self._cut()
+
+    def _collect(self, block):
+        """
+        @return {numpy.ndarray} pcs of the line table entries this brought
+        in, whose blocks are still to be scanned.
+        """
+        self.blocks[block_key(block)] = block
+        # Functions defined or inlined from headers bring their own lines.
+        if block.function is not None and block.function.symtab is not None:
+            return self.lines.add(block.function.symtab)
+        return numpy.empty(0, dtype=numpy.uint64)
+
+    def _cut(self):
+        # The static block spans whatever other units sit between this
+        # unit's functions, so only function blocks and their nested blocks
+        # are painted.
+        keys = [key for key in self.blocks if not key[2] and not key[3]]
+        bounds = set()
+        for start, end, _, _ in keys:
+            bounds.add(start)
+            bounds.add(end)
+        self.bounds = sorted(bounds)
+        owners = [None] * max(len(self.bounds) - 1, 0)
+        # Paint outermost first so inner blocks win.
+        keys.sort(key=lambda key: key[0] - key[1])
+        for key in keys:
+            lo = bisect.bisect_left(self.bounds, key[0])
+            hi = bisect.bisect_left(self.bounds, key[1])
+            owners[lo:hi] = [key] * (hi - lo)
+        self.owners = owners
+
+    def _dump(self, cache):
+        """
+        @return {tuple} (arrays, meta) to store in cache, with addresses
+        relative to the objfile's base.
+        """
+        starts = [cache.relative(key[0]) if key else 0 for key in self.owners]
+        ends = [cache.relative(key[1]) if key else 0 for key in self.owners]
+        flags = [self._NONE if key is None else
+                 (self._GLOBAL if key[2] else 0) |
+                 (self._STATIC if key[3] else 0) for key in self.owners]
+        arrays = {
+            "bounds": numpy.array([cache.relative(bound)
+                                   for bound in self.bounds],
+                                  dtype=numpy.uint64),
+            "owner_start": numpy.array(starts, dtype=numpy.uint64),
+            "owner_end": numpy.array(ends, dtype=numpy.uint64),
+            "owner_flags": numpy.array(flags, dtype=numpy.uint8),
+            "line_pcs": cache.relative(self.lines.pcs),
+            "line_lines": self.lines.lines,
+            "line_files": self.lines.files,
+        }
+        meta = {"files": [symtab.filename for symtab in self.lines.symtabs]}
+        return arrays, meta
+
+    def _restore(self, arrays, meta, cache):
+        self.bounds = [cache.absolute(bound) for bound in arrays["bounds"]]
+        self.owners = [
+            None if flags & self._NONE else
+            (cache.absolute(start), cache.absolute(end),
+             bool(flags & self._GLOBAL), bool(flags & self._STATIC))
+            for start, end, flags in zip(arrays["owner_start"],
+                                         arrays["owner_end"],
+                                         arrays["owner_flags"])]
+        self.lines.restore(cache.absolute(arrays["line_pcs"]),
+                           arrays["line_lines"],
+                           arrays["line_files"],
+                           [CachedSymtab(f) for f in meta["files"]])
+
+    def block(self, key):
+        if key not in self.blocks:
+            block = gdb.block_for_pc(key[0])
+            while block is not None and block_key(block) != key:
+                block = block.superblock
+            if block is None:
+                raise RuntimeError("cached block no longer exists")
+            self.blocks[key] = block
+        return self.blocks[key]
+
+    def symbols_for(self, key):
+        if key not in self.symbols:
+            self.symbols[key] = list(self.block(key))
+        return self.symbols[key]
+
+    def children(self, key):
+        """
+        @return {list} keys of the blocks directly nested in the block with
+        key, or in the unit's static block for its key.
+        """
+        inner = [k for k in self.owners if k is not None and k != key]
+        if not key[3]:
+            inner = [k for k in inner if key[0] <= k[0] and k[1] <= key[1]]
+        children = list()
+        end = None
+        # Blocks nest or are disjoint, so a block starting before the end of
+        # the last child is inside it.
+        for k in sorted(set(inner), key=lambda k: (k[0], -k[1])):
+            if end is not None and k[0] < end:
+                continue
+            children.append(k)
+            end = k[1]
+        return children
+
+    def ranges(self):
+        """
+        @return {list} [start, end) ranges of the code of this unit's
+        blocks, sorted and disjoint.
+        """
+        ranges = list()
+        for i, key in enumerate(self.owners):
+            if key is None:
+                continue
+            low, high = self.bounds[i], self.bounds[i + 1]
+            if ranges and ranges[-1][1] == low:
+                ranges[-1][1] = high
+            else:
+                ranges.append([low, high])
+        return ranges
+
+    def block_key(self, pc):
+        i = bisect.bisect_right(self.bounds, pc) - 1
+        if i < 0 or i >= len(self.owners):
+            return None
+        return self.owners[i]
+
+
+class BlockIndex(object):
+
+    def __init__(self):
+        self.invalidate()
+
+    def __len__(self):
+        return len(self._units)
+
+    def invalidate(self, event=None):
+        self._bases = None
+        self._units = dict()
+        self._byStatic = dict()
+        self._starts = list()
+        self._ranges = list()
+        self._strays = dict()
+        self._caches = dict()
+
+    def cache(self, objfile):
+        """
+        @return {DebugInfoCache} the on-disk cache for objfile, or None.
+        """
+        if objfile is None:
+            return None
+        if objfile.filename not in self._caches:
+            self._caches[objfile.filename] = \
+                debugcache.DebugInfoCache.for_objfile(
+                    objfile, self._base(objfile))
+        return self._caches[objfile.filename]
+
+    def _base(self, objfile):
+        """
+        @return {int} the lowest address of objfile's sections, which moves
+        with its load address; 0 if gdb does not say.
+        """
+        if self._bases is None:
+            try:
+                text = gdb.execute("info files", to_string=True)
+            except gdb.error:
+                text = ""
+            self._bases = dict(
+                (os.path.realpath(path), base) for path, base in
+                debugcache.parse_info_files(text).items())
+        return self._bases.get(os.path.realpath(objfile.filename), 0)
+
+    def cache_for_pc(self, pc):
+        sal = gdb.find_pc_line(pc)
+        if sal.symtab is None:
+            return None
+        return self.cache(sal.symtab.objfile)
+
+    def _unit(self, pc):
+        i = bisect.bisect_right(self._starts, pc) - 1
+        if i >= 0 and pc < self._ranges[i][1]:
+            return self._ranges[i][2]
+        if pc in self._strays:
+            return self._strays[pc]
+        unit = self._load_unit(pc)
+        if unit is not None and unit.block_key(pc) is not None:
+            return unit
+        # Outside every range of its unit, or in none.
+        self._strays[pc] = unit
+        return unit
+
+    def _load_unit(self, pc):
+        sal = gdb.find_pc_line(pc)
+        if sal.symtab is None:
+            return None
+        key = unit_key(sal.symtab)
+        unit = self._units.get(key)
+        if unit is None:
+            unit = UnitIndex(sal.symtab, self.cache(sal.symtab.objfile))
+            self._units[key] = unit
+            self._byStatic[unit.staticKey] = unit
+            for start, end in unit.ranges():
+                i = bisect.bisect_left(self._starts, start)
+                self._starts.insert(i, start)
+                self._ranges.insert(i, (start, end, unit))
+        return unit
+
+    def block_for_pc(self, pc):
+        """
+        Same as gdb.block_for_pc, including the RuntimeError.
+        """
+        unit = self._unit(pc)
+        key = unit.block_key(pc) if unit is not None else None
+        if key is None:
+            return gdb.block_for_pc(pc)
+        return unit.block(key)
+
+    def sub_blocks(self, block):
+        """
+        @return {list} the blocks directly nested in block.  Only blocks of
+        units which have been indexed are known, so the global block has
+        none.
+        """
+        if block.is_global:
+            return list()
+        staticKey = block_key(block if block.is_static
+                              else block.static_block)
+        unit = self._byStatic.get(staticKey)
+        if unit is None and not block.is_static:
+            unit = self._unit(block.start)
+        if unit is None or unit.staticKey != staticKey:
+            return list()
+        return [unit.block(key) for key in unit.children(block_key(block))]
+
+    def symbols_for_pc(self, pc):
+        """
+        @return {list} the symbols of the innermost block containing pc.
+        """
+        unit = self._unit(pc)
+        key = unit.block_key(pc) if unit is not None else None
+        if key is None:
+            return list(gdb.block_for_pc(pc))
+        return unit.symbols_for(key)
+
+    def _range_end(self, pc):
+        """
+        @return {int} the end of the indexed block range containing pc, or
+        pc + 1 if there is none.
+        """
+        i = bisect.bisect_right(self._starts, pc) - 1
+        if i >= 0 and pc < self._ranges[i][1]:
+            return self._ranges[i][1]
+        return pc + 1
+
+    def find_lines(self, pcs):
+        """
+        Map many pcs at once, each with the line table of its own unit.
+        Each run of pcs in one indexed block range costs one searchsorted.
+
+        @param pcs {numpy.ndarray} sorted pcs.
+        @return {tuple} (lines, starts) as for LineTable.find_all, with 0
+        for pcs without line information.
+        """
+        lines = numpy.zeros(len(pcs), dtype=numpy.int32)
+        starts = numpy.zeros(len(pcs), dtype=numpy.uint64)
+        i = 0
+        while i < len(pcs):
+            pc = int(pcs[i])
+            unit = self._unit(pc)
+            j = max(int(numpy.searchsorted(pcs, self._range_end(pc))), i + 1)
+            if unit is not None:
+                lines[i:j], starts[i:j] = unit.lines.find_all(pcs[i:j])
+            i = j
+        # Like gdb.find_pc_line, no line means no entry pc either.
+        starts[lines == 0] = 0
+        return lines, starts
+
+    def line_table(self, pc):
+        """
+        @return {LineTable} the line table of the unit containing pc, or
+        None.
+        """
+        unit = self._unit(pc)
+        return unit.lines if unit is not None else None
+
+    def find_pc_line(self, pc):
+        """
+        @return {LineEntry} like gdb.find_pc_line; symtab is None and line
+        is 0 when pc has no line information.
+        """
+        unit = self._unit(pc)
+        if unit is None:
+            return LineEntry(None, 0, 0)
+        entry = unit.lines.find(pc)
+        if entry is None:
+            sal = gdb.find_pc_line(pc)
+            if sal.symtab is not None and not unit.lines.has(sal.symtab):
+                unit.lines.add(sal.symtab)
+            return LineEntry(sal.symtab, sal.line, sal.pc)
+        return entry
+
+
+index = BlockIndex()
+gdb.events.new_objfile.connect(index.invalidate)
+
+
+def block_for_pc(pc):
+    return index.block_for_pc(pc)
+
+
+def sub_blocks(block):
+    return index.sub_blocks(block)
+
+
+def symbols_for_pc(pc):
+    return index.symbols_for_pc(pc)
+
+
+def find_pc_line(pc):
+    return index.find_pc_line(pc)
+
+
+def find_lines(pcs):
+    return index.find_lines(pcs)
+
+
+def line_table(pc):
+    return index.line_table(pc)
+
+
+def cache_for_pc(pc):
+    return index.cache_for_pc(pc)
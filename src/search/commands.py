@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- encoding UTF-8 -*-
+"""
+gdb commands for the memory oracle.  Source this file from gdb to add them.
+"""
+
+import os
+import sys
+import gdb
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from instrument import clock, recorder
+
+
+class OraclePrefixCommand(gdb.Command):
+    "Prefix command for the memory oracle."
+
+    def __init__(self):
+        super(OraclePrefixCommand, self).__init__("oracle",
+                                                  gdb.COMMAND_DATA,
+                                                  gdb.COMPLETE_NONE,
+                                                  True)
+
+
+class OracleStatsCommand(gdb.Command):
+    """Show or control the snapshot instrumentation.
+
+    oracle stats            print what has been recorded
+    oracle stats on         reset the counters and start recording
+    oracle stats off        stop recording
+    oracle stats reset      clear the counters
+    oracle stats json FILE  write what has been recorded to FILE"""
+
+    def __init__(self):
+        super(OracleStatsCommand, self).__init__("oracle stats",
+                                                 gdb.COMMAND_DATA,
+                                                 gdb.COMPLETE_FILENAME)
+
+    def invoke(self, arg, from_tty):
+        argv = gdb.string_to_argv(arg)
+        if not argv:
+            print(recorder.format())
+            if not recorder.enabled:
+                print("(recording is off; use \"oracle stats on\")")
+        elif argv[0] == "on":
+            recorder.enable()
+        elif argv[0] == "off":
+            recorder.disable()
+        elif argv[0] == "reset":
+            recorder.reset()
+        elif argv[0] == "json" and len(argv) == 2:
+            recorder.save(argv[1])
+        else:
+            raise gdb.GdbError("usage: oracle stats [on|off|reset|json FILE]")
+
+
+class OracleWalkCommand(gdb.Command):
+    """Snapshot only what is reachable from an expression.
+
+    oracle walk EXPRESSION [DEPTH] [FILE]
+
+    The value of EXPRESSION is the only root of the search; the frame chain
+    is left alone.  DEPTH limits how many edges away from the root the
+    search goes (unlimited if omitted or "-").  The subgraph is saved to FILE,
+    walk.gt by default.  Quote EXPRESSION if it contains spaces."""
+
+    def __init__(self):
+        super(OracleWalkCommand, self).__init__("oracle walk",
+                                                gdb.COMMAND_DATA,
+                                                gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        # Imported here so that sourcing this file stays cheap and does not
+        # depend on everything data pulls in.
+        import data
+        argv = gdb.string_to_argv(arg)
+        if not 1 <= len(argv) <= 3:
+            raise gdb.GdbError("usage: oracle walk EXPRESSION [DEPTH] [FILE]")
+        depth = None
+        if len(argv) > 1 and argv[1] != "-":
+            try:
+                depth = int(argv[1])
+            except ValueError:
+                raise gdb.GdbError("DEPTH must be a number: " + argv[1])
+        fileName = argv[2] if len(argv) > 2 else "walk.gt"
+        val = gdb.parse_and_eval(argv[0])
+        start = clock()
+        graph = data.MemoryGraph(maxDepth=depth)
+        graph.search(frames=False, values=[val])
+        graph.save(fileName)
+        print("walked %d memories from %s in %.3f s; saved to %s"
+              % (len(graph), argv[0], clock() - start,
+                 fileName))
+
+
+OraclePrefixCommand()
+OracleStatsCommand()
+OracleWalkCommand()
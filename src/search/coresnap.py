@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- encoding UTF-8 -*-
+"""
+Snapshots taken from a core file instead of the live inferior.
+
+At a stop, CoreSnapshot.take writes a core with gcore and starts the graph
+walk in separate batch-mode gdb processes which load that core.  Control
+returns as soon as the core is written, so the inferior is only held stopped
+for the duration of the dump; the caller resumes it as usual.  The walk is
+split over several gdb processes by a sharding.ShardedWalk, which is
+coordinated from a background thread that never touches the gdb API.
+"""
+
+import os
+import tempfile
+import threading
+import gdb
+import sharding
+
+
+class CoreSnapshot(object):
+
+    def __init__(self, directory=None, shards=1, tracker=None,
+                 debugger="gdb", keepCore=False, maxRounds=4):
+        self.directory = directory or tempfile.mkdtemp(prefix="memoryoracle-")
+        self.shards = shards
+        self.tracker = tracker
+        self.debugger = debugger
+        self.keepCore = keepCore
+        self.maxRounds = maxRounds
+        self.core = None
+        self.graph = None
+        self.error = None
+        self._thread = None
+
+    def take(self, name="snapshot"):
+        """
+        Dump a core and start the offline walk.  Does not wait for it.
+
+        @return {str} the core file path.
+        """
+        self.core = os.path.join(self.directory, name + ".core")
+        gdb.execute("gcore " + self.core, to_string=True)
+        heap = None
+        if self.tracker is not None:
+            heap = os.path.join(self.directory, name + ".heap.npz")
+            self.tracker.save(heap)
+        walk = sharding.ShardedWalk(gdb.current_progspace().filename,
+                                    self.core,
+                                    os.path.join(self.directory, name),
+                                    self.shards, heap=heap,
+                                    debugger=self.debugger,
+                                    maxRounds=self.maxRounds)
+        self.graph = None
+        self.error = None
+        self._thread = threading.Thread(target=self._run,
+                                        args=(walk, self.core))
+        self._thread.daemon = True
+        self._thread.start()
+        return self.core
+
+    def _run(self, walk, core):
+        """
+        @param core {str} the core walk reads; self.core may already name
+        the core of a later take, whose results are then left alone.
+        """
+        graph = error = None
+        try:
+            graph = walk.run()
+        except Exception as e:
+            # Raised again by wait, in the thread that asked for the graph.
+            error = e
+        finally:
+            if threading.current_thread() is self._thread:
+                self.graph, self.error = graph, error
+            if not self.keepCore:
+                os.remove(core)
+
+    def done(self):
+        return self._thread is not None and not self._thread.is_alive()
+
+    def wait(self):
+        """
+        @return {graph_tool.Graph} the merged graph of the walk.  If the walk
+        failed, its exception is raised here instead.
+        """
+        if self._thread is not None:
+            self._thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.graph
@@ -10,17 +10,29 @@ debugged by GDB.
 Exceptions related to debugee data extraction.
 """
 
+import os
 import re
+import bisect
+import itertools
+import hashlib
+import zlib
 import gdb
 import gdb.types
-import graph_tool.all
-import graph_tool.search
-import graph_tool.community
 # import cProfile
 # import re
 # import traceback
+import numpy
 import sortedcontainers
 from uuid import uuid4 as unique_addr
+import blockindex
+import sharding
+import procmem
+import memcheck
+import instrument
+import softdirty
+import graphstore
+import globalroots
+from instrument import recorder
 
 
 class SpeciesIndex(object):
@@ -194,23 +206,136 @@ class SpeciesIndex(object):
 
 
 def species_code(obj):
+    """
+    @return {int} the SpeciesIndex code of obj: SpeciesIndex.frame for
+    frames, otherwise the code of its type.
+    """
+    if isinstance(obj, gdb.Frame):
+        return SpeciesIndex.frame
+    return _value_type(obj).code
+
+
+class FetchedValue(object):
+    """
+    A gdb.Value built from bytes which were already read from the inferior,
+    together with the address they were read from.
+
+    gdb.Values made from buffers have no address of their own, so the address
+    is carried alongside and propagated to fields and elements.
+    """
+
+    __slots__ = ("value", "address")
+
+    def __init__(self, value, address):
+        self.value = value
+        self.address = address
+
+
+def _child(parent, value, offset):
+    if isinstance(parent, FetchedValue):
+        return FetchedValue(value, parent.address + offset)
+    return value
+
+
+def _coalesce(ranges, gap=0):
+    """
+    Merge sorted [start, end) ranges which overlap or are at most gap bytes
+    apart.
+
+    @return {list} merged [start, end] pairs.
+    """
+    merged = list()
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + gap:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+_ARRAY_SUFFIX = re.compile(r"^(.*?)\s*\[(\d*)\]$")
+
+
+def lookup_type_name(typeName):
+    """
+    Resolve a type name as str(gdb.Type) spells it, including the array and
+    pointer suffixes which gdb.lookup_type does not parse.
+
+    @return {gdb.Type} the type, or None if it cannot be resolved, as for
+    anonymous structs and unions.
+    """
+    typeName = typeName.strip()
+    try:
+        return gdb.lookup_type(typeName)
+    except gdb.error:
+        pass
+    if "(" not in typeName:
+        if typeName.endswith("*"):
+            target = lookup_type_name(typeName[:-1])
+            return target.pointer() if target is not None else None
+        match = _ARRAY_SUFFIX.match(typeName)
+        if match is not None:
+            element = lookup_type_name(match.group(1))
+            if element is None:
+                return None
+            return element.array(max(int(match.group(2) or 0) - 1, 0))
+    # Function pointers and qualified types, which a cast understands.
+    try:
+        return gdb.parse_and_eval("(" + typeName + ")0").type
+    except gdb.error:
+        return None
+
+
+_CHARACTER_NAMES = {"char", "signed char", "unsigned char", "wchar_t"}
+
+
+_STRING_ENCODINGS = {1: "latin-1", 2: "utf-16-le", 4: "utf-32-le"}
+
+
+def _is_character(typ):
+    typ = typ.strip_typedefs()
+    if typ.code == SpeciesIndex.character:
+        return True
+    return typ.code == SpeciesIndex.integer and typ.name in _CHARACTER_NAMES
 
 
 def _extract_value(obj, frame=None):
-    if isinstance(obj, gdb.Value):
+    if isinstance(obj, FetchedValue):
+        val = obj.value
+    elif isinstance(obj, gdb.Value):
         val = obj
     elif isinstance(obj, gdb.Symbol):
+        if recorder.enabled:
+            recorder.count("symbol_value")
         if frame is not None:
             val = obj.value(frame)
         else:
             val = obj.value()
     elif isinstance(obj, gdb.Frame):
+        if recorder.enabled:
+            recorder.count("frame_function")
         val = obj.function().value(obj)
     else:
         raise ValueError("invalid obj of type: " + str(type(obj)))
     return val
 
+def _value_type(obj):
+    """
+    @return {gdb.Type} the type of obj without reading it, or None for frames.
+    """
+    if isinstance(obj, FetchedValue):
+        return obj.value.type
+    if isinstance(obj, (gdb.Value, gdb.Symbol)):
+        return obj.type
+    return None
+
+# Addresses at or above this are uuid stand-ins for memories without one.
+_MAX_ADDRESS = 2**64
+
+
 def _extract_address(obj, frame=None):
+    if isinstance(obj, FetchedValue):
+        return obj.address
     if isinstance(obj, (gdb.Value, gdb.Symbol)):
         val = _extract_value(obj, frame=frame).address
     elif isinstance(obj, gdb.Frame):
@@ -260,8 +385,9 @@ class Memory(object):
         """
 
         self.address = _extract_address(raw, frame)
-        if isinstance(raw, gdb.Value):
-            self._init_from_value(raw)
+        self.size = 0
+        if isinstance(raw, (gdb.Value, FetchedValue)):
+            self._init_from_value(_extract_value(raw))
             self.classification = Memory._classification.value
         elif isinstance(raw, gdb.Frame):
             self._init_from_frame(raw)
@@ -285,9 +411,19 @@ class Memory(object):
 
     def _init_from_value(self, value):
         self.is_optimized_out = value.is_optimized_out
+        self.size = value.type.sizeof
         self.type_name = value.type.name
         self.dynamic_type_name = value.dynamic_type.name
         self.type_code = value.type.code
+        self.target = None
+        if value.type.code == SpeciesIndex.pointer and \
+                not self.is_optimized_out:
+            # The label of a pointer does not show its target, so the
+            # target is kept for refresh to tell a retargeted pointer by.
+            try:
+                self.target = int(value)
+            except gdb.error:
+                pass
         if value.type.code in Memory._EXTRACTABLE_TYPES:
             # TODO: consider extracting value with more grace.
             # For example, ints as int, floats as float, and so forth.
@@ -307,6 +443,7 @@ class Memory(object):
         function = frame.function()
         if function is not None:
             self._init_from_symbol(frame.function(), frame=frame)
+            self.size = 0
         else:
             self.value = "UNKNOWN"
             self.dynamic_type_name = "[[[FRAME]]]"
@@ -317,6 +454,36 @@ class Memory(object):
         frameName = frameName if frameName is not None else "-unknown-"
         self.name = " ".join(["FRAME", frameName, "@", stackPointer])
 
+    def summarize_string(self, length, prefix, digest, truncated=False):
+        """
+        Turn this memory (the first character of a C string) into a single
+        description of the whole string.
+        """
+        self.type_code = SpeciesIndex.string
+        self.size *= length if truncated else length + 1
+        self.length = length
+        self.prefix = prefix
+        self.digest = digest
+        self.truncated = truncated
+        self.unreadable = False
+        quoted = '"' + prefix + ('..."' if len(prefix) < length else '"')
+        size = str(length) + ("+" if truncated else "")
+        self.value = " ".join([str(self.type_name) + "[" + size + "]",
+                               quoted, "#" + digest])
+
+    def summarize_unreadable(self):
+        """
+        Turn this memory (the first character of a C string) into the
+        description of a string none of which could be read.
+        """
+        self.type_code = SpeciesIndex.string
+        self.length = 0
+        self.prefix = ""
+        self.digest = None
+        self.truncated = True
+        self.unreadable = True
+        self.value = str(self.type_name) + "[?] <unreadable>"
+
     def is_real(self):
         return self.address is not None
 
@@ -340,7 +507,7 @@ class AlreadyFound(Exception):
     pass
 
 
-class BasicExtractor(graph_tool.search.AStarVisitor):
+class BasicExtractor(object):
 
     """
     Specifically, Extractor instances must:
@@ -448,22 +615,128 @@ class DynamicTracker(object):
 
     def __init__(self):
         self.allocated = dict()
+        self.sites = dict()
 
-    def allocate(self, key, size):
+    def allocate(self, key, size, site=None):
         if key not in self.allocated:
             self.allocated[key] = size
+            if site is not None:
+                self.sites[key] = site
         else:
             raise ValueError("address already allocated")
 
     def is_allocated(self, key):
         return key in self.allocated
 
+    def clear(self):
+        self.allocated.clear()
+        self.sites.clear()
+
     def deallocate(self, key):
         del self.allocated[key]
+        self.sites.pop(key, None)
 
     def list_addrs(self):
         return self.allocated.keys()
 
+    def site(self, key):
+        return self.sites.get(key)
+
+    def as_arrays(self):
+        """
+        @return {tuple} (starts, sizes) of every tracked block as numpy
+        uint64 arrays sorted by start address.
+        """
+        count = len(self.allocated)
+        starts = numpy.fromiter(self.allocated.keys(), numpy.uint64, count)
+        sizes = numpy.fromiter(self.allocated.values(), numpy.uint64, count)
+        order = numpy.argsort(starts, kind="mergesort")
+        return starts[order], sizes[order]
+
+    def save(self, fileName):
+        starts, sizes = self.as_arrays()
+        numpy.savez(fileName, starts=starts, sizes=sizes)
+
+    def load(self, fileName):
+        """
+        Add the blocks saved by save, e.g. in a process walking a core file
+        where no allocation was ever seen.
+        """
+        arrays = numpy.load(fileName)
+        for start, size in zip(arrays["starts"], arrays["sizes"]):
+            self.allocated[int(start)] = int(size)
+
+
+class StackTable(object):
+    """
+    Interning table for bounded call stacks.
+
+    Each distinct tuple of return addresses is stored once and handed out as
+    a small integer, so an allocation only has to remember that integer.
+    Turning a stack back into function names and lines is deferred until a
+    report asks for it, and is cached per pc.
+    """
+
+    def __init__(self, depth=8):
+        self.depth = depth
+        self._ids = dict()
+        self._stacks = list()
+        self._symbols = dict()
+
+    def __len__(self):
+        return len(self._stacks)
+
+    def intern(self, pcs):
+        pcs = tuple(pcs)
+        stackId = self._ids.get(pcs)
+        if stackId is None:
+            stackId = len(self._stacks)
+            self._ids[pcs] = stackId
+            self._stacks.append(pcs)
+        return stackId
+
+    def capture(self, frame=None):
+        """
+        Intern the return addresses of up to depth callers of frame.
+
+        @param frame {gdb.Frame} the allocator's frame; the newest frame if
+        not given.
+        @return {int} the stack id.
+        """
+        if frame is None:
+            frame = gdb.newest_frame()
+        pcs = list()
+        frame = frame.older()
+        while frame is not None and len(pcs) < self.depth:
+            pcs.append(frame.pc())
+            frame = frame.older()
+        return self.intern(pcs)
+
+    def stack(self, stackId):
+        return self._stacks[stackId]
+
+    def _symbolize_pc(self, pc):
+        if pc not in self._symbols:
+            sal = blockindex.find_pc_line(pc)
+            try:
+                function = blockindex.block_for_pc(pc).function
+            except RuntimeError:
+                function = None
+            name = function.name if function is not None else hex(pc)
+            if sal.symtab is not None:
+                name += " at " + sal.symtab.filename + ":" + str(sal.line)
+            self._symbols[pc] = name
+        return self._symbols[pc]
+
+    def symbolize(self, stackId):
+        """
+        @return {list} one "function at file:line" string per frame.
+        """
+        return [self._symbolize_pc(pc) for pc in self._stacks[stackId]]
+
+    def format(self, stackId):
+        return " <- ".join(self.symbolize(stackId))
+
 
 class TrackingBreak(gdb.Breakpoint):
 
@@ -480,14 +753,20 @@ class TrackingBreak(gdb.Breakpoint):
 
     def stop(self):
         # print("Tracking break stop")
-        self.trigger()
+        if recorder.enabled:
+            start = instrument.clock()
+            self.trigger()
+            recorder.stop_time(type(self).__name__,
+                               instrument.clock() - start)
+        else:
+            self.trigger()
         # size = x86_64.get_arg(0)
         # NewFinishBreak(size)
         return False
 
     @classmethod
-    def track(cls, addr, size):
-        cls.tracker.allocate(addr, size)
+    def track(cls, addr, size, site=None):
+        cls.tracker.allocate(addr, size, site=site)
 
     def trigger(self):
         raise NotImplementedError("You must implement a trigger!")
@@ -502,7 +781,13 @@ class TrackingFinishBreak(gdb.FinishBreakpoint):
         self.superior = superior
 
     def stop(self):
-        self.trigger()
+        if recorder.enabled:
+            start = instrument.clock()
+            self.trigger()
+            recorder.stop_time(type(self).__name__,
+                               instrument.clock() - start)
+        else:
+            self.trigger()
         # addr = x86_64.get_ret()
         # TrackingFinishBreak._SUPERIOR.track(addr, self.size)
         return False
@@ -514,6 +799,19 @@ class TrackingFinishBreak(gdb.FinishBreakpoint):
 class DynamicMemoryTrackingBreak(TrackingBreak):
 
     tracker = DynamicTracker()
+    stacks = StackTable()
+
+    @classmethod
+    def track(cls, addr, size, site=None):
+        if cls.tracker.is_allocated(addr):
+            # The block was freed where no breakpoint saw it.
+            cls.tracker.deallocate(addr)
+        cls.tracker.allocate(addr, size, site=site)
+
+    @classmethod
+    def untrack(cls, addr):
+        if cls.tracker.is_allocated(addr):
+            cls.tracker.deallocate(addr)
 
 
 class NewTrackingBreak(DynamicMemoryTrackingBreak):
@@ -523,7 +821,8 @@ class NewTrackingBreak(DynamicMemoryTrackingBreak):
 
     def trigger(self):
         size = x86_64.get_arg(0)
-        NewTrackingFinishBreak(size)
+        site = self.stacks.capture()
+        NewTrackingFinishBreak((size, site))
 
 
 class NewTrackingFinishBreak(TrackingFinishBreak):
@@ -533,7 +832,82 @@ class NewTrackingFinishBreak(TrackingFinishBreak):
 
     def trigger(self):
         addr = x86_64.get_ret()
-        self.superior.track(addr, self.info)
+        size, site = self.info
+        self.superior.track(addr, size, site=site)
+
+
+class MallocTrackingBreak(DynamicMemoryTrackingBreak):
+
+    def __init__(self, function="malloc"):
+        super(MallocTrackingBreak, self).__init__(function)
+
+    def size(self):
+        return x86_64.get_arg(0)
+
+    def trigger(self):
+        site = self.stacks.capture()
+        NewTrackingFinishBreak((self.size(), site))
+
+
+class CallocTrackingBreak(MallocTrackingBreak):
+
+    def __init__(self):
+        super(CallocTrackingBreak, self).__init__("calloc")
+
+    def size(self):
+        return x86_64.get_arg(0) * x86_64.get_arg(1)
+
+
+class ReallocTrackingBreak(DynamicMemoryTrackingBreak):
+
+    def __init__(self):
+        super(ReallocTrackingBreak, self).__init__("realloc")
+
+    def trigger(self):
+        site = self.stacks.capture()
+        ReallocTrackingFinishBreak((x86_64.get_arg(0), x86_64.get_arg(1),
+                                    site))
+
+
+class ReallocTrackingFinishBreak(TrackingFinishBreak):
+
+    def __init__(self, info):
+        super(ReallocTrackingFinishBreak, self).__init__(info,
+                                                         ReallocTrackingBreak)
+
+    def trigger(self):
+        addr = x86_64.get_ret()
+        old, size, site = self.info
+        if addr == 0 and size != 0:
+            # Failed; the old block is untouched.
+            return
+        self.superior.untrack(old)
+        if addr != 0:
+            self.superior.track(addr, size, site=site)
+
+
+class FreeTrackingBreak(DynamicMemoryTrackingBreak):
+
+    def __init__(self):
+        super(FreeTrackingBreak, self).__init__("free")
+
+    def trigger(self):
+        self.untrack(x86_64.get_arg(0))
+
+
+def track_allocations():
+    """
+    Install the breakpoints which track heap blocks: the malloc family, with
+    free and realloc removing the blocks they release.
+
+    operator new and new[] are not broken on: libstdc++ implements them with
+    malloc, which is handed the same size and returns the same block, so a
+    breakpoint on them would only stop each allocation twice.
+
+    @return {list} the breakpoints.
+    """
+    return [MallocTrackingBreak(), CallocTrackingBreak(),
+            ReallocTrackingBreak(), FreeTrackingBreak()]
 
 
 class FunctionBreak(gdb.Breakpoint):
@@ -599,15 +973,111 @@ class LocationQueue(object):
     def not_empty(self):
         return not not self._keys
 
+    def __len__(self):
+        return len(self._keys)
 
-class MemoryGraph(object):
+
+class FrameRecord(object):
+    """
+    What one search learned about a frame, keyed by FrameCache.key.
+
+    symbols are the frame's block symbols.  span is the [low, high) range of
+    frame memory occupied by the frame-relative symbols, and digest hashes its
+    contents.  records holds (Memory, parent record index, gdb.Type) for each
+    memory found beneath the frame which lies inside span; the parent index is
+    -1 for the frame itself.
+    """
+
+    def __init__(self, symbols, span, volatile):
+        self.symbols = symbols
+        self.span = span
+        self.volatile = volatile
+        self.digest = None
+        self.records = None
+
+    def covers(self, address):
+        return self.span is not None and \
+            self.span[0] <= address < self.span[1]
+
+
+class FrameCache(object):
+    """
+    Per-frame search results which survive between snapshots.
+
+    Outer frames (main, event loops) rarely change between stops, so a frame
+    whose (function, pc, stack pointer) and frame memory are unchanged is
+    replayed from its record rather than searched again.  Each MemoryGraph
+    has a cache of its own; pass the same FrameCache to the graphs of
+    successive snapshots to share it.  A search forgets the frames it did
+    not see, so a cache should not be shared by unrelated searches.
+    """
 
     def __init__(self):
-        self._network = graph_tool.Graph(directed=True)
+        self._records = dict()
+
+    def __len__(self):
+        return len(self._records)
+
+    @staticmethod
+    def key(frame):
+        function = frame.function()
+        name = function.name if function is not None else None
+        return (name, int(frame.pc()), int(x86_64.get_stack_pointer(frame)))
+
+    def get(self, key):
+        return self._records.get(key)
+
+    def store(self, key, record):
+        self._records[key] = record
+
+    def retain(self, keys):
+        """
+        Forget every frame not in keys.
+        """
+        self._records = dict((k, self._records[k])
+                             for k in keys if k in self._records)
+
+    def clear(self):
+        self._records.clear()
+
+
+class MemoryGraph(object):
+
+    # Pointer targets closer together than this are read in one go.
+    _READ_GAP = 256
+
+    # Buffered vertices are added to the graph in batches of this many.
+    _FLUSH_SIZE = 4096
+
+    def __init__(self, frameCache=None, batchPointers=False,
+                 maxStringLength=4096, stringChunk=256, stringPrefix=32,
+                 shard=None, reader=None, backend=None, searchFilter=None,
+                 maxDepth=None):
+        self._network = graphstore.create(backend)
         self._network.vertex_properties.memories = \
             self._network.new_vertex_property("python::object")
         self._network.vertex_properties.label = \
             self._network.new_vertex_property("string")
+        self._network.vertex_properties.address = \
+            self._network.new_vertex_property("int64_t")
+        self._network.vertex_properties.size = \
+            self._network.new_vertex_property("int64_t")
+        self._network.vertex_properties.species = \
+            self._network.new_vertex_property("int32_t")
+        self._network.vertex_properties.thread = \
+            self._network.new_vertex_property("int32_t")
+        self._network.vertex_properties.type_name = \
+            self._network.new_vertex_property("string")
+        self._network.vertex_properties.name = \
+            self._network.new_vertex_property("string")
+        self._vertexCount = 0
+        self._vertexThreads = list()
+        self._vertexDepths = list()
+        self.maxDepth = maxDepth
+        self._thread = None
+        self.filter = searchFilter
+        self._pendingMemories = list()
+        self._pendingEdges = list()
         self._discovered_types = dict()
         self._queue = LocationQueue()
         self._handler = {
@@ -618,34 +1088,504 @@ class MemoryGraph(object):
             SpeciesIndex.function: self._search_frame,
             SpeciesIndex.typedef: self._search_typedef,
         }
+        if recorder.enabled:
+            for code, handler in self._handler.items():
+                self._handler[code] = recorder.timed(handler.__name__,
+                                                     handler)
         self._exploredMemories = set()
-
-    def _enqueue(self, obj, parentVertex=None, frame=None):
+        self._addresses = list()
+        self._pages = dict()
+        self._stackSpans = set()
+        self._untypedTargets = dict()
+        self.frameCache = frameCache if frameCache is not None \
+            else FrameCache()
+        self._seenFrames = set()
+        self._frameRecords = dict()
+        self._batchPointers = batchPointers
+        self._frontier = list()
+        self.maxStringLength = maxStringLength
+        self.stringChunk = stringChunk
+        self.stringPrefix = stringPrefix
+        self._shard = shard
+        self._reader = reader
+        self.crossShard = list()
+        self._vertices = dict()
+        self._types = dict()
+        self._relink = False
+        self._rootTypes = dict()
+        self.skippedRoots = 0
+        if shard is not None:
+            self._heapStarts, self._heapSizes = \
+                NewTrackingBreak.tracker.as_arrays()
+
+    def _add_vertex(self, mem, parentVertex=None, valueType=None):
+        vertex = self._vertexCount
+        self._vertexCount += 1
+        if self._thread is not None:
+            self._vertexThreads.append(self._thread)
+        elif parentVertex is not None:
+            self._vertexThreads.append(self._vertexThreads[int(parentVertex)])
+        else:
+            self._vertexThreads.append(0)
+        if parentVertex is not None:
+            self._pendingEdges.append((int(parentVertex), vertex))
+            self._vertexDepths.append(
+                self._vertexDepths[int(parentVertex)] + 1)
+        else:
+            self._vertexDepths.append(0)
+        self._pendingMemories.append(mem)
+        if len(self._pendingMemories) >= self._FLUSH_SIZE:
+            self._flush()
+        if mem.address < _MAX_ADDRESS:
+            self._addresses.append(mem.address)
+            if valueType is not None and mem.size:
+                self._vertices[mem] = int(vertex)
+                self._types[int(vertex)] = valueType
+                self._index_pages(mem)
+        else:
+            self._addresses.append(None)
+        return vertex
+
+    def _memory_pages(self, mem):
+        return range(mem.address // softdirty.PAGE_SIZE,
+                     (mem.address + mem.size - 1) // softdirty.PAGE_SIZE + 1)
+
+    def _index_pages(self, mem):
+        for page in self._memory_pages(mem):
+            self._pages.setdefault(page, set()).add(mem)
+
+    def _unindex_pages(self, mem):
+        for page in self._memory_pages(mem):
+            mems = self._pages.get(page)
+            if mems is not None:
+                mems.discard(mem)
+                if not mems:
+                    del self._pages[page]
+
+    def _flush(self):
+        """
+        Add the buffered vertices and edges to the graph in bulk.  Vertices
+        are numbered as they are created, so the graph agrees with every
+        vertex handed out once this returns.
+        """
+        first = self._network.num_vertices()
+        count = self._vertexCount - first
+        if count:
+            mems = self._pendingMemories
+            self._network.add_vertex(count)
+            props = self._network.vertex_properties
+            for i, mem in enumerate(mems, first):
+                vertex = self._network.vertex(i)
+                props.memories[vertex] = mem
+                props.label[vertex] = str(mem.name) + ":" + mem.value
+                props.type_name[vertex] = mem.type_name or ""
+                props.name[vertex] = mem.name or ""
+            props.address.a[first:] = numpy.fromiter(
+                (mem.address if mem.address < 2**63 else -1 for mem in mems),
+                numpy.int64, count)
+            props.size.a[first:] = numpy.fromiter(
+                (mem.size for mem in mems), numpy.int64, count)
+            props.species.a[first:] = numpy.fromiter(
+                (mem.type_code for mem in mems), numpy.int32, count)
+            props.thread.a[first:] = numpy.array(self._vertexThreads[first:],
+                                                 dtype=numpy.int32)
+            self._pendingMemories = list()
+        if self._pendingEdges:
+            self._network.add_edge_list(
+                numpy.array(self._pendingEdges, dtype=numpy.int64))
+            self._pendingEdges = list()
+
+    def _enqueue(self, obj, parentVertex=None, frame=None, rootOf=None,
+                 root=False):
+        """
+        @param rootOf {FrameRecord} the record obj is a top-level memory of,
+        when it has no parent vertex.
+        @param root {bool} obj is a root although it has a parent vertex, as
+        the variables of a frame are.
+        """
+        if self.maxDepth is not None and parentVertex is not None and \
+                self._vertexDepths[int(parentVertex)] >= self.maxDepth:
+            return None
         mem = Memory(obj, frame=frame)
         if mem.is_optimized_out:
             return None
+        if self.filter is not None and not isinstance(obj, gdb.Frame) and \
+                not self._passes_filter(obj, mem,
+                                        root or parentVertex is None):
+            return None
         if mem in self._exploredMemories:
+            if self._relink and parentVertex is not None \
+                    and mem in self._vertices:
+                self._pendingEdges.append((int(parentVertex),
+                                           self._vertices[mem]))
             return None
-        vertex = self._network.add_vertex()
-        if parentVertex is not None:
-            self._network.add_edge(parentVertex, vertex)
-        self._network.vertex_properties.memories[vertex] = mem
-        self._network.vertex_properties.label[vertex] = str(mem.name) + ":" + mem.value
+        vertex = self._add_vertex(mem, parentVertex, _value_type(obj))
+        if not self._owns(mem.address):
+            # Another shard expands this heap block; leave a stub.
+            self._exploredMemories.add(mem)
+            valueType = _extract_value(obj, frame=frame).type
+            self.crossShard.append((str(valueType), mem.address))
+            return (parentVertex, vertex)
+        if rootOf is not None and rootOf.covers(mem.address):
+            rootOf.records.append((mem, -1, _value_type(obj)))
+            self._frameRecords[int(vertex)] = (rootOf, len(rootOf.records) - 1)
+        elif parentVertex is not None:
+            self._record_frame_memory(obj, mem, parentVertex, vertex, frame)
+        if self._thread is not None:
+            if isinstance(obj, gdb.Frame):
+                # A frame is only usable while its thread is selected.
+                self._exploredMemories.add(mem)
+                self._search_adjacent(obj, mem, vertex)
+                return (parentVertex, vertex)
+            obj, frame = self._pin(obj, frame)
         self._queue.enqueue(obj, mem, vertex, frame)
         return (parentVertex, vertex)
 
-    def _prime_search(self):
-        self._search_frame_chain_current()
+    def _passes_filter(self, obj, mem, root):
+        valueType = _value_type(obj)
+        typeName = None
+        if valueType is not None:
+            typeName = valueType.name or str(valueType)
+        address = mem.address if mem.address < _MAX_ADDRESS else None
+        return self.filter.accepts_memory(typeName, address, root=root)
+
+    def _fan_out(self, count):
+        if self.filter is None:
+            return count
+        return self.filter.fan_out(count)
+
+    def _pin(self, obj, frame):
+        """
+        Read a frame symbol's value now, while its thread is selected, so
+        that it can be searched after switching to another thread.
+        """
+        if not isinstance(obj, gdb.Symbol) or frame is None:
+            return obj, frame
+        val = _extract_value(obj, frame=frame)
+        if val.is_lazy:
+            val.fetch_lazy()
+        return val, None
+
+    def _record_frame_memory(self, obj, mem, parentVertex, vertex, frame):
+        owner = self._frameRecords.get(int(parentVertex))
+        if owner is None:
+            return
+        record, parentIndex = owner
+        if not record.covers(mem.address):
+            return
+        record.records.append(
+            (mem, parentIndex, _extract_value(obj, frame=frame).type))
+        self._frameRecords[int(vertex)] = (record, len(record.records) - 1)
 
-    def search(self):
-        self._prime_search()
-        while self._queue.not_empty():
-            tasks = self._queue.dequeue()
-            for obj, mem, vertex, frame in tasks:
-                if mem in self._exploredMemories:
+    def __len__(self):
+        return self._vertexCount
+
+    def addresses(self):
+        """
+        @return {numpy.ndarray} sorted, unique addresses of every memory
+        reached by the search so far and still reachable after refresh, and
+        of the targets of void pointers among them.
+        """
+        return numpy.unique(numpy.fromiter(itertools.chain(
+            (address for address in self._addresses if address is not None),
+            self._untypedTargets.values()), numpy.uint64))
+
+    def _owns(self, address):
+        if self._shard is None:
+            return True
+        index, count = self._shard
+        owner = sharding.owner_of(address, self._heapStarts,
+                                  self._heapSizes, count)
+        return owner is None or owner == index
+
+    def _search_threads(self, threads):
+        """
+        Add the frame chain of each thread in turn.  Each thread is selected
+        once; its frames and their symbols' values are read while it is, and
+        only the values go on the queue.  The selected thread and frame are
+        restored.
+        """
+        original = gdb.selected_thread()
+        try:
+            originalFrame = gdb.selected_frame()
+        except gdb.error:
+            originalFrame = None
+        try:
+            for thread in threads:
+                if not thread.is_valid():
                     continue
-                self._search_adjacent(obj, mem, vertex, enclosingFrame=frame)
-                self._exploredMemories.add(mem)
+                thread.switch()
+                self._thread = thread.num
+                self._search_frame_chain_current()
+        finally:
+            self._thread = None
+            if original is not None and original.is_valid():
+                original.switch()
+                if originalFrame is not None and originalFrame.is_valid():
+                    originalFrame.select()
+
+    def _search_globals(self):
+        """
+        Add the global and static variables as roots.  Each contiguous range
+        of them is read in one go and hashed, and a range which is unchanged
+        since the last search is replayed from the frame cache, just like an
+        unchanged frame.
+        """
+        for low, high, variables in globalroots.roots.ranges(self._READ_GAP):
+            key = ("globals", low, high)
+            if not self._in_shard(key):
+                continue
+            self._seenFrames.add(key)
+            record = self.frameCache.get(key)
+            if record is None:
+                record = FrameRecord([variable.symbol for variable in variables],
+                                     (low, high), list())
+                self.frameCache.store(key, record)
+            digest = self._frame_digest(record)
+            if self._unchanged(record, digest):
+                self._replay_frame(record, None, None)
+                continue
+            record.digest = digest
+            record.records = list()
+            for symbol in record.symbols:
+                self._enqueue(symbol, rootOf=record)
+
+    def _prime_search(self, frames=True, roots=(), threads=False,
+                      globals=False, values=()):
+        for val in values:
+            self._enqueue(val)
+        if globals:
+            self._search_globals()
+        if frames:
+            if threads and gdb.selected_thread() is not None:
+                self._search_threads(sorted(gdb.selected_inferior().threads(),
+                                            key=lambda thread: thread.num))
+            else:
+                self._search_frame_chain_current()
+        for typeName, address in roots:
+            val = self._root_value(typeName, address)
+            if val is None:
+                self.skippedRoots += 1
+                if recorder.enabled:
+                    recorder.count("skipped_root")
+                continue
+            self._enqueue(val)
+
+    def _root_value(self, typeName, address):
+        """
+        @return {gdb.Value} the typeName at address, or None if the type
+        cannot be resolved in this process.
+        """
+        if typeName not in self._rootTypes:
+            if recorder.enabled:
+                recorder.count("lookup_type")
+            self._rootTypes[typeName] = lookup_type_name(typeName)
+        typ = self._rootTypes[typeName]
+        if typ is None:
+            return None
+        return gdb.Value(address).cast(typ.pointer()).dereference()
+
+    def search(self, frames=True, roots=(), threads=False, globals=False,
+               values=()):
+        """
+        @param frames {bool} start from the frame chain.
+        @param roots {iterable} extra (type name, address) roots.  Roots
+        whose type cannot be resolved here, e.g. anonymous structs, are
+        skipped and counted in skippedRoots.
+        @param threads {bool} start from the frame chains of every thread
+        rather than just the selected one.  Vertices are tagged with the
+        number of the thread they were reached from in the thread property.
+        @param globals {bool} start from the global and static variables too.
+        @param values {iterable} extra gdb.Value roots.
+        """
+        self._prime_search(frames=frames, roots=roots, threads=threads,
+                           globals=globals, values=values)
+        self._drain()
+        self.frameCache.retain(self._seenFrames)
+
+    def _drain(self):
+        while True:
+            while self._queue.not_empty():
+                if recorder.enabled:
+                    recorder.sample_queue(len(self._queue))
+                tasks = self._queue.dequeue()
+                for obj, mem, vertex, frame in tasks:
+                    if mem in self._exploredMemories:
+                        continue
+                    self._search_adjacent(obj, mem, vertex, enclosingFrame=frame)
+                    self._exploredMemories.add(mem)
+            self._flush()
+            if not self._frontier:
+                break
+            self._search_pointer_frontier()
+
+    def _dirty_vertices(self, dirtyPages, pageSize):
+        """
+        @return {list} the memories lying on dirtyPages, looked up page by
+        page in the page index, in address order.
+        """
+        found = set()
+        for page in dirtyPages:
+            low = int(page) * pageSize
+            high = low + pageSize
+            for indexPage in range(low // softdirty.PAGE_SIZE,
+                                   (high - 1) // softdirty.PAGE_SIZE + 1):
+                for mem in self._pages.get(indexPage, ()):
+                    if mem.address < high and mem.address + mem.size > low:
+                        found.add(mem)
+        return sorted(found, key=lambda mem: mem.address)
+
+    @staticmethod
+    def _on_stack(address, spans):
+        i = bisect.bisect_right(spans, (address, _MAX_ADDRESS)) - 1
+        return i >= 0 and address < spans[i][1]
+
+    def refresh(self, dirtyPages, pageSize=softdirty.PAGE_SIZE):
+        """
+        Bring the graph up to date after the inferior has run, re-extracting
+        only the memories which lie on pages written since the last snapshot.
+
+        Changed values are relabelled in place.  A changed pointer loses its
+        out-edges and is searched again; whatever it reaches that is already
+        in the graph is linked to rather than added again, and whatever is no
+        longer reachable from a root is retired.  Frames are not revisited,
+        and neither is the memory of the searched frames, which may have
+        returned since; search them again with search, where the frame cache
+        skips the unchanged ones.
+
+        @param dirtyPages {numpy.ndarray} sorted page numbers, e.g. from
+        softdirty.SoftDirtyTracker.dirty_pages.
+        @return {int} the number of memories whose value changed.
+        """
+        self._flush()
+        changed = 0
+        cut = False
+        stackSpans = sorted(self._stackSpans)
+        self._relink = True
+        try:
+            for mem in self._dirty_vertices(dirtyPages, pageSize):
+                if self._on_stack(mem.address, stackSpans):
+                    continue
+                vertex = self._network.vertex(self._vertices[mem])
+                valueType = self._types[int(vertex)]
+                pointer = gdb.Value(mem.address).cast(valueType.pointer())
+                try:
+                    if mem.type_code == SpeciesIndex.string:
+                        newMem, val = self._read_string(pointer), None
+                    else:
+                        val = pointer.dereference()
+                        newMem = Memory(val)
+                        newMem.name, newMem.line = mem.name, mem.line
+                except gdb.MemoryError:
+                    continue
+                if newMem.value == mem.value and \
+                        getattr(newMem, "target", None) == \
+                        getattr(mem, "target", None):
+                    continue
+                changed += 1
+                del self._vertices[mem]
+                self._vertices[newMem] = int(vertex)
+                self._unindex_pages(mem)
+                self._index_pages(newMem)
+                self._exploredMemories.discard(mem)
+                props = self._network.vertex_properties
+                props.memories[vertex] = newMem
+                props.label[vertex] = str(newMem.name) + ":" + newMem.value
+                props.size[vertex] = newMem.size
+                if newMem.type_code == SpeciesIndex.pointer:
+                    cut = self._remove_out_edges(vertex) or cut
+                    self._queue.enqueue(val, newMem, vertex, None)
+                else:
+                    self._exploredMemories.add(newMem)
+            self._drain()
+        finally:
+            self._relink = False
+        if cut:
+            self._retire_unreachable()
+        return changed
+
+    def _remove_out_edges(self, vertex):
+        """
+        @return {bool} whether vertex had any out-edges.
+        """
+        return len(graphstore.remove_out_edges(self._network, vertex)) > 0
+
+    def _reachable(self):
+        """
+        @return {numpy.ndarray} boolean mask of the vertices reachable from
+        the roots of the search, the vertices with no parent.
+        """
+        count = self._network.num_vertices()
+        edges = numpy.asarray(self._network.get_edges())[:, :2]
+        order = numpy.argsort(edges[:, 0], kind="mergesort")
+        targets = edges[order, 1]
+        offsets = numpy.searchsorted(edges[order, 0], numpy.arange(count + 1))
+        seen = numpy.array(self._vertexDepths, dtype=numpy.int64) == 0
+        frontier = numpy.nonzero(seen)[0]
+        while len(frontier):
+            lengths = offsets[frontier + 1] - offsets[frontier]
+            shift = offsets[frontier] - (numpy.cumsum(lengths) - lengths)
+            reached = targets[numpy.repeat(shift, lengths) +
+                              numpy.arange(lengths.sum())]
+            frontier = numpy.unique(reached[~seen[reached]])
+            seen[frontier] = True
+        return seen
+
+    def _retire_unreachable(self):
+        """
+        Retire the vertices which refresh cut off from every root: they keep
+        their vertex but lose their edges and no longer count as reached, so
+        addresses and the leak detector stop seeing them.  A whole pass is
+        needed because a cut-off cycle still has in-edges.
+        """
+        props = self._network.vertex_properties
+        for vertex in numpy.nonzero(~self._reachable())[0]:
+            vertex = int(vertex)
+            if self._addresses[vertex] is None:
+                continue
+            self._addresses[vertex] = None
+            self._remove_out_edges(vertex)
+            mem = props.memories[vertex]
+            self._exploredMemories.discard(mem)
+            if self._vertices.get(mem) == vertex:
+                del self._vertices[mem]
+                self._unindex_pages(mem)
+            self._types.pop(vertex, None)
+            self._frameRecords.pop(vertex, None)
+            self._untypedTargets.pop(vertex, None)
+
+    def _read_memory(self, address, length):
+        """
+        Read raw inferior memory, through the bulk reader when there is one.
+        The result may share a buffer with the next read.
+        """
+        if self._reader is None:
+            if recorder.enabled:
+                recorder.count("read_memory", length)
+            return gdb.selected_inferior().read_memory(address, length)
+        if recorder.enabled:
+            recorder.count("read_proc", length)
+        try:
+            return self._reader.read(address, length)
+        except procmem.UnreadableMemory as e:
+            raise gdb.MemoryError(str(e))
+
+    def _fetch(self, obj, frame=None):
+        """
+        With a bulk reader, read a whole aggregate in one go so that its
+        fields and elements are built from the fetched bytes.
+        """
+        if self._reader is None or isinstance(obj, FetchedValue):
+            return obj
+        val = _extract_value(obj, frame=frame)
+        if val.address is None or val.type.sizeof == 0:
+            return obj
+        try:
+            contents = bytes(self._read_memory(int(val.address),
+                                               val.type.sizeof))
+        except gdb.MemoryError:
+            return obj
+        return FetchedValue(gdb.Value(contents, val.type), int(val.address))
 
     def _search_adjacent(self, obj, mem, vertex, enclosingFrame=None):
         if mem.type_code in self._handler:
@@ -671,7 +1611,7 @@ class MemoryGraph(object):
         self._discovered_types[tname] = typedef.type
         val = _extract_value(typedef, frame=enclosingFrame)
         # trueType = typedef.type.strip_typedefs()
-        castVal = val.cast(typedef.type.target())
+        castVal = _child(typedef, val.cast(typedef.type.target()), 0)
         self._enqueue(castVal, parentVertex=vertex, frame=enclosingFrame)
 
     def _search_frame_chain_down(self, initialFrame, vertex=None):
@@ -691,41 +1631,173 @@ class MemoryGraph(object):
         self._search_frame_chain_up(gdb.newest_frame())
 
     def _search_array(self, array, vertex, enclosingFrame=None):
-        start, end = array.type.range()
-        arrayRange = range(int(start), int(end) + 1)
+        array = self._fetch(array, frame=enclosingFrame)
+        val = _extract_value(array, frame=enclosingFrame)
+        start, end = val.type.range()
+        elementSize = val.type.target().sizeof
+        arrayRange = range(int(start),
+                           int(start) + self._fan_out(int(end) - int(start) + 1))
         for i in arrayRange:
-            self._enqueue(array[i], parentVertex=vertex, frame=enclosingFrame)
+            element = _child(array, val[i], (i - int(start)) * elementSize)
+            self._enqueue(element, parentVertex=vertex, frame=enclosingFrame)
 
     def _search_struct(self, struct, vertex, enclosingFrame=None):
+        struct = self._fetch(struct, frame=enclosingFrame)
         val = _extract_value(struct, frame=enclosingFrame)
         for field in val.type.fields():
-            self._enqueue(val[field], parentVertex=vertex, frame=enclosingFrame)
+            offset = getattr(field, "bitpos", 0) // 8
+            member = _child(struct, val[field], offset)
+            self._enqueue(member, parentVertex=vertex, frame=enclosingFrame)
+
+    def _in_shard(self, key):
+        """
+        Frames are dealt out to shards by a stable hash of their key, so that
+        separate processes walking the same core agree on the split.
+        """
+        if self._shard is None:
+            return True
+        index, count = self._shard
+        return zlib.crc32(repr(key).encode("utf-8")) % count == index
 
     def _search_frame(self, frame, vertex, enclosingFrame=None):
+        if self.filter is not None:
+            function = frame.function()
+            if not self.filter.accepts_frame(
+                    function.name if function is not None else None,
+                    frame.pc()):
+                return
+        key = self.frameCache.key(frame)
+        if not self._in_shard(key):
+            return
+        self._seenFrames.add(key)
+        record = self.frameCache.get(key)
+        if record is None:
+            record = self._build_frame_record(frame)
+            if record is None:
+                return
+            self.frameCache.store(key, record)
+        if record.span is not None:
+            self._stackSpans.add(record.span)
+        digest = self._frame_digest(record)
+        if self._unchanged(record, digest):
+            self._replay_frame(record, vertex, frame)
+            return
+        record.digest = digest
+        record.records = list()
+        self._frameRecords[int(vertex)] = (record, -1)
+        for symbol in record.symbols:
+            self._enqueue(symbol, parentVertex=vertex, frame=frame,
+                          root=True)
+
+    def _build_frame_record(self, frame):
+        if recorder.enabled:
+            recorder.count("symbols_for_pc")
         sal = frame.find_sal()
         try:
-            block = gdb.block_for_pc(sal.pc)
-        except RuntimeError as e:
-            return
-        for symbol in block:
-            self._enqueue(symbol, parentVertex=vertex, frame=frame)
+            symbols = blockindex.symbols_for_pc(sal.pc)
+        except RuntimeError:
+            return None
+        low = high = None
+        volatile = list()
+        for symbol in symbols:
+            address = None
+            if symbol.needs_frame:
+                if recorder.enabled:
+                    recorder.count("symbol_value")
+                try:
+                    val = symbol.value(frame)
+                    address = val.address
+                except (gdb.error, RuntimeError):
+                    pass
+            if address is None:
+                volatile.append(symbol)
+                continue
+            start = int(address)
+            end = start + val.type.sizeof
+            low = start if low is None else min(low, start)
+            high = end if high is None else max(high, end)
+        span = (low, high) if low is not None else None
+        return FrameRecord(symbols, span, volatile)
+
+    @staticmethod
+    def _unchanged(record, digest):
+        """
+        A frame whose memory could not be hashed is never taken to be
+        unchanged.
+        """
+        return record.records is not None and digest is not None and \
+            digest == record.digest
+
+    def _frame_digest(self, record):
+        """
+        @return {bytes} a digest of the record's frame memory, or None if
+        there is none or it can not be read.
+        """
+        if record.span is None:
+            return None
+        low, high = record.span
+        try:
+            contents = self._read_memory(low, high - low)
+        except gdb.MemoryError:
+            return None
+        return hashlib.sha1(bytes(contents)).digest()
+
+    def _replay_frame(self, record, vertex, frame):
+        """
+        Rebuild the in-frame part of a frame's subgraph from its record.
+
+        Pointers are put back on the queue so that whatever they reach
+        outside the frame is searched as usual.  A typedef of a pointer is
+        not: its record is followed by the record of the pointer it was cast
+        to, and queueing both would add the pointer's targets twice.  Symbols
+        which do not live in frame memory are always searched again.
+        """
+        vertices = list()
+        for mem, parentIndex, valueType in record.records:
+            parent = vertex if parentIndex < 0 else vertices[parentIndex]
+            if (parentIndex >= 0 and parent is None) or \
+                    mem in self._exploredMemories or mem in self._vertices:
+                vertices.append(None)
+                continue
+            child = self._add_vertex(mem, parent, valueType)
+            vertices.append(child)
+            if valueType.code == SpeciesIndex.pointer:
+                obj = gdb.Value(mem.address).cast(
+                    valueType.pointer()).dereference()
+                self._queue.enqueue(obj, mem, child, None)
+            else:
+                self._exploredMemories.add(mem)
+        for symbol in record.volatile:
+            self._enqueue(symbol, parentVertex=vertex, frame=frame,
+                          root=True)
 
     def _search_pointer(self, pointer, vertex, enclosingFrame=None):
         val = _extract_value(pointer, frame=enclosingFrame)
-        try:
-            string = val.string()
-            for i in range(len(string)):
-                self._enqueue(val[i], parentVertex=vertex, frame=enclosingFrame)
+        targetType = val.type.strip_typedefs().target()
+        targetCode = targetType.strip_typedefs().code
+        if targetCode == SpeciesIndex.void:
+            # Nothing to search, but a block held only through a void * is
+            # still referenced.
+            self._untypedTargets.pop(int(vertex), None)
+            if int(val) != 0:
+                self._untypedTargets[int(vertex)] = int(val)
+            return
+        if targetCode == SpeciesIndex.function:
+            return
+        if _is_character(targetType):
+            self._search_string(val, vertex)
+            return
+
+        if self._batchPointers:
+            self._frontier.append((val, vertex))
             return
-        except gdb.error:
-            print("cant interpret ", val.referenced_value().type.name , "* as string")
 
         target = int(val)
         if NewTrackingBreak.tracker.is_allocated(target):
             bytesAllocated = NewTrackingBreak.tracker.allocated[target]
             targetSize = \
                 val.dereference().type.strip_typedefs().sizeof
-            for i in range(bytesAllocated // targetSize):
+            for i in range(self._fan_out(bytesAllocated // targetSize)):
                 self._enqueue(val[i], parentVertex=vertex, frame=None)
         else:
             if target != 0:
@@ -734,22 +1806,191 @@ class MemoryGraph(object):
             else:
                 pass
 
-    def save(self, fileName="memorygraph.dot"):
-        self._network.save(fileName)
+    def _search_string(self, val, vertex):
+        """
+        Add a single string vertex for the C string val points to.
+        """
+        if int(val) == 0:
+            return
+        mem = self._read_string(val)
+        if mem in self._exploredMemories:
+            return
+        self._add_vertex(mem, vertex, val.type.strip_typedefs().target())
+        self._exploredMemories.add(mem)
 
+    def _read_string(self, val):
+        """
+        Summarize the C string val points to as one memory.
 
-gdb.execute("target remote | vgdb")
-nb = NewTrackingBreak()
-# nab = NewArrayBreak()
-# gdb.execute("b main")
-gdb.execute("b fib")
-for i in range(2**5 - 1):
+        The string is read in chunks which never cross a chunk-aligned
+        boundary (and so never a page boundary), up to maxStringLength
+        characters.  A string whose first character cannot be read is still
+        summarized, as unreadable.
+        """
+        target = int(val)
+        charType = val.type.strip_typedefs().target()
+        width = charType.strip_typedefs().sizeof
+        terminator = b"\0" * width
+        limit = self.maxStringLength * width
+        chunks = list()
+        read = 0
+        length = None
+        while read < limit:
+            address = target + read
+            size = min(self.stringChunk - address % self.stringChunk,
+                       limit - read)
+            size -= size % width
+            if size == 0:
+                break
+            try:
+                chunk = bytes(self._read_memory(address, size))
+            except gdb.MemoryError:
+                break
+            chunks.append(chunk)
+            pos = chunk.find(terminator)
+            while pos != -1 and (read + pos) % width:
+                pos = chunk.find(terminator, pos + 1)
+            if pos != -1:
+                length = (read + pos) // width
+                break
+            read += size
+        if not chunks:
+            # Not even the first character is readable (an uninitialized or
+            # dangling pointer): describe the string from its address and
+            # type alone rather than reading it again.
+            mem = Memory(FetchedValue(gdb.Value(terminator, charType),
+                                      target))
+            mem.summarize_unreadable()
+            return mem
+        data = b"".join(chunks)
+        truncated = length is None
+        if truncated:
+            length = len(data) // width
+        data = data[:length * width]
+        encoding = _STRING_ENCODINGS.get(width, "latin-1")
+        prefix = data[:self.stringPrefix * width].decode(encoding, "replace")
+        mem = Memory(val.dereference())
+        mem.summarize_string(length, prefix,
+                             hashlib.sha1(data).hexdigest()[:16], truncated)
+        return mem
+
+    def _search_pointer_frontier(self):
+        """
+        Dereference every pointer collected since the last call at once.
+
+        Targets are sized from the heap index (a whole tracked block) or the
+        pointed-to type, sorted, merged into as few ranges as possible and
+        read with one request per range.  Values are then built from the
+        fetched bytes, so enqueueing them costs no further reads.  One
+        unreadable target (unmapped, or freed and returned to the system)
+        makes a merged read fail, so the targets of a failed range are read
+        again one by one and only the unreadable ones are dropped.
+        """
+        frontier, self._frontier = self._frontier, list()
+        tracker = NewTrackingBreak.tracker
+        plan = list()
+        for val, vertex in frontier:
+            target = int(val)
+            if target == 0:
+                continue
+            elementType = val.type.strip_typedefs().target()
+            elementSize = elementType.strip_typedefs().sizeof
+            if elementSize == 0:
+                continue
+            if tracker.is_allocated(target):
+                count = max(self._fan_out(
+                    tracker.allocated[target] // elementSize), 1)
+            else:
+                count = 1
+            plan.append((target, count, elementSize, elementType, vertex))
+        plan.sort(key=lambda entry: entry[0])
+        ranges = _coalesce(((target, target + count * size)
+                            for target, count, size, _, _ in plan),
+                           gap=self._READ_GAP)
+        i = 0
+        for low, high in ranges:
+            entries = list()
+            while i < len(plan) and plan[i][0] < high:
+                entries.append(plan[i])
+                i += 1
+            for base, contents, group in self._read_targets(low, high,
+                                                            entries):
+                for target, count, size, elementType, vertex in group:
+                    for n in range(count):
+                        offset = target - base + n * size
+                        raw = contents[offset:offset + size]
+                        obj = FetchedValue(gdb.Value(raw, elementType),
+                                           target + n * size)
+                        self._enqueue(obj, parentVertex=vertex)
+
+    def _read_targets(self, low, high, entries):
+        """
+        @return {list} (address, contents, entries) for the frontier entries
+        in [low, high) which could be read: one read of the whole range, or
+        one per entry when that fails.
+        """
+        try:
+            return [(low, bytes(self._read_memory(low, high - low)),
+                     entries)]
+        except gdb.MemoryError:
+            if len(entries) == 1:
+                return list()
+        reads = list()
+        for entry in entries:
+            target, count, size = entry[:3]
+            try:
+                reads.append((target,
+                              bytes(self._read_memory(target, count * size)),
+                              [entry]))
+            except gdb.MemoryError:
+                pass
+        return reads
+
+    def to_graph_tool(self):
+        """
+        @return {graph_tool.Graph} the graph, for analyses which need
+        graph_tool.
+        """
+        self._flush()
+        return graphstore.to_graph_tool(self._network)
+
+    def save(self, fileName="memorygraph.dot"):
+        """
+        Save the graph without its memories property.  Memories can only be
+        unpickled where data (and so gdb) can be imported; the address,
+        size, species, type_name and name properties identify each memory
+        instead.
+        """
+        self._flush()
+        props = self._network.vertex_properties
+        memories = props["memories"]
+        del props["memories"]
+        try:
+            self._network.save(fileName)
+        finally:
+            props["memories"] = memories
+
+
+if __name__ == "__main__":
+    gdb.execute("target remote | vgdb")
+    # MEMORY_ORACLE_TRACK=1 stops on every allocation instead of asking
+    # memcheck for the heap blocks at snapshot time.
+    track = os.environ.get("MEMORY_ORACLE_TRACK") == "1"
+    if track:
+        breaks = track_allocations()
+    # nab = NewArrayBreak()
+    # gdb.execute("b main")
+    gdb.execute("b fib")
+    for i in range(2**5 - 1):
+        gdb.execute("c")
+    if not track:
+        memcheck.Memcheck().refresh(NewTrackingBreak.tracker,
+                                    NewTrackingBreak.stacks)
+    graph = MemoryGraph()
+    # FunctionBreak._searcher = searcher
+    graph.search()
+    graph.save()
+    gdb.execute("clear")
+    gdb.execute("continue")
     gdb.execute("c")
-graph = MemoryGraph()
-# FunctionBreak._searcher = searcher
-graph.search()
-graph.save()
-gdb.execute("clear")
-gdb.execute("continue")
-gdb.execute("c")
-gdb.execute("q")
+    gdb.execute("q")
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- encoding UTF-8 -*-
+"""
+On-disk cache of static debug-info analysis.
+
+Line tables, block boundaries and disassembly maps depend only on the binary,
+so they are written once per objfile and memory mapped back in by later gdb
+sessions.  An objfile is identified by its build-id, or by its path, mtime
+and size when it has none.
+
+Each artifact is a directory of .npy files, one per array, plus an optional
+JSON sidecar for small non-array data.  Artifacts are written to a temporary
+directory and renamed into place, so a reader never sees a partial write.
+Addresses are stored relative to the objfile's base (the lowest address of
+its sections, see parse_info_files), so that position independent code
+loaded at a different address on the next run finds the same artifacts.
+
+The cache lives under $MEMORY_ORACLE_CACHE, or ~/.cache/memoryoracle when that
+is not set.  Setting it to the empty string disables caching.  Artifacts
+which have not been read for MAX_AGE seconds are removed, and then the least
+recently read ones until the cache holds at most $MEMORY_ORACLE_CACHE_SIZE
+MiB (MAX_BYTES by default).  This happens once per process, on its first
+write.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import numpy
+
+MAX_BYTES = 256 << 20
+MAX_AGE = 30 * 24 * 3600
+
+_SECTION = re.compile(
+    r"^\s*(0x[0-9a-fA-F]+) - (0x[0-9a-fA-F]+) is (\S+)(?: in (.*))?$")
+_EXEC_FILE = re.compile(r"^\s*`(.*)', file type")
+
+# Roots pruned by this process.
+_pruned = set()
+
+
+def cache_root():
+    root = os.environ.get("MEMORY_ORACLE_CACHE")
+    if root is None:
+        root = os.path.join(os.path.expanduser("~"), ".cache", "memoryoracle")
+    return root or None
+
+
+def max_bytes():
+    size = os.environ.get("MEMORY_ORACLE_CACHE_SIZE")
+    return int(size) << 20 if size else MAX_BYTES
+
+
+def parse_info_files(text):
+    """
+    @return {dict} file path -> lowest address of its sections, from the
+    output of gdb's "info files".  Sections of a core file are left out.
+    """
+    bases = dict()
+    execFile = None
+    inCore = False
+    for line in text.splitlines():
+        if line.startswith("Local core dump file:"):
+            inCore = True
+            continue
+        if line.startswith("Local exec file:"):
+            inCore = False
+            continue
+        match = _EXEC_FILE.match(line)
+        if match:
+            execFile = match.group(1)
+            continue
+        match = _SECTION.match(line)
+        if not match or (inCore and match.group(4) is None):
+            continue
+        path = match.group(4) or execFile
+        if path is None:
+            continue
+        start = int(match.group(1), 16)
+        bases[path] = min(start, bases.get(path, start))
+    return bases
+
+
+def _artifacts(root):
+    """
+    @return {list} (last use, size in bytes, path) of every artifact under
+    root.
+    """
+    artifacts = list()
+    for key in os.listdir(root):
+        keyPath = os.path.join(root, key)
+        if not os.path.isdir(keyPath):
+            continue
+        for name in os.listdir(keyPath):
+            path = os.path.join(keyPath, name)
+            if not os.path.isdir(path):
+                continue
+            try:
+                used = os.stat(path).st_mtime
+                size = sum(os.path.getsize(os.path.join(path, entry))
+                           for entry in os.listdir(path))
+            except OSError:
+                continue
+            artifacts.append((used, size, path))
+    return artifacts
+
+
+def prune(root, maxBytes=None, maxAge=MAX_AGE, now=None):
+    """
+    Remove the artifacts under root which have not been used for maxAge
+    seconds, then the least recently used ones until the rest fit in
+    maxBytes.
+
+    @return {int} the number of artifacts removed.
+    """
+    if maxBytes is None:
+        maxBytes = max_bytes()
+    if now is None:
+        now = time.time()
+    try:
+        artifacts = sorted(_artifacts(root))
+    except OSError:
+        return 0
+    total = sum(size for _, size, _ in artifacts)
+    removed = 0
+    for used, size, path in artifacts:
+        if now - used <= maxAge and total <= maxBytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed += 1
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass
+    return removed
+
+
+def objfile_key(objfile):
+    """
+    @return {str} the build-id of objfile, or a digest of its path, mtime
+    and size.
+    """
+    buildId = getattr(objfile, "build_id", None)
+    if buildId:
+        return buildId
+    filename = os.path.realpath(objfile.filename)
+    stat = os.stat(filename)
+    ident = ":".join([filename, str(stat.st_mtime), str(stat.st_size)])
+    return "path-" + hashlib.sha1(ident.encode("utf-8")).hexdigest()
+
+
+class DebugInfoCache(object):
+
+    def __init__(self, key, root, base=0):
+        """
+        @param base {int} the objfile's load address; addresses are cached
+        relative to it.
+        """
+        self.key = key
+        self.root = root
+        self.path = os.path.join(root, key)
+        self.base = base
+
+    @classmethod
+    def for_objfile(cls, objfile, base=0):
+        """
+        @return {DebugInfoCache} the cache of objfile, or None if caching is
+        disabled or objfile can not be identified.
+        """
+        root = cache_root()
+        if root is None or objfile is None or objfile.filename is None:
+            return None
+        try:
+            return cls(objfile_key(objfile), root, base)
+        except OSError:
+            return None
+
+    def relative(self, addresses):
+        """
+        @return addresses (an int or a numpy uint64 array) as offsets from
+        the objfile's base.
+        """
+        return addresses - numpy.uint64(self.base) \
+            if isinstance(addresses, numpy.ndarray) else addresses - self.base
+
+    def absolute(self, offsets):
+        """
+        @return offsets (an int or a numpy array) as runtime addresses.
+        """
+        if isinstance(offsets, numpy.ndarray):
+            return offsets.astype(numpy.uint64) + numpy.uint64(self.base)
+        return int(offsets) + self.base
+
+    def _artifact(self, name):
+        return os.path.join(self.path, name)
+
+    def has(self, name):
+        return os.path.isdir(self._artifact(name))
+
+    def load_arrays(self, name):
+        """
+        @return {dict} array name -> read-only memory mapped array, or None
+        if the artifact is not cached.
+        """
+        path = self._artifact(name)
+        if not os.path.isdir(path):
+            return None
+        try:
+            # The mtime of an artifact records its last use, for prune.
+            os.utime(path, None)
+        except OSError:
+            pass
+        arrays = dict()
+        for entry in os.listdir(path):
+            if entry.endswith(".npy"):
+                arrays[entry[:-4]] = numpy.load(os.path.join(path, entry),
+                                                mmap_mode="r")
+        return arrays
+
+    def load_json(self, name):
+        path = os.path.join(self._artifact(name), "meta.json")
+        if not os.path.isfile(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def store(self, name, arrays, meta=None):
+        """
+        Write an artifact.  Failures are ignored; the cache is only ever an
+        optimisation.
+        """
+        if self.root not in _pruned:
+            _pruned.add(self.root)
+            prune(self.root)
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            tmp = tempfile.mkdtemp(dir=self.path)
+        except OSError:
+            return
+        try:
+            for arrayName, array in arrays.items():
+                numpy.save(os.path.join(tmp, arrayName + ".npy"),
+                           numpy.asarray(array))
+            if meta is not None:
+                with open(os.path.join(tmp, "meta.json"), "w") as f:
+                    json.dump(meta, f)
+            os.rename(tmp, self._artifact(name))
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -2,65 +2,167 @@
 # -*- encoding UTF-8 -*-
 
 import gdb
-import graph_tool.all
+import graphstore
 import sortedcontainers
 import re
+import numpy
+import blockindex
 
 _arch = None
 
 
-def _block_key(block):
-    return (block.start, block.end, block.is_global, block.is_static)
-
-
 class BlockGraph(object):
+    """
+    Graph of the lexical blocks of a program and the symbols they hold.
 
-    def __init__(self, linetable=None):
-        if linetable is None:
-            self._linetable = gdb.selected_frame().find_sal().symtab.linetable()
-        else:
-            self._linetable = linetable
-        self._network = graph_tool.Graph(directed=True)
+    By default every block reachable from the line table is added and
+    disassembled up front.  With lazy=True nothing is read at construction;
+    block vertices are created by vertex_for_pc / vertex_for_function, their
+    symbols and nested blocks by expand, their superblock by parent, and
+    disassembly by disassembly.
+    """
+
+    def __init__(self, linetable=None, verbose=False, lazy=False,
+                 backend=None):
+        self._network = graphstore.create(backend)
         self._block_property = self._network.new_vertex_property("python::object")
         self._network.vertex_properties.label = self._network.new_vertex_property("string")
         self._blocks = dict()
         self._lookupVertex = dict()
+        self._expanded = set()
+        self._disassembly = dict()
+        if lazy:
+            return
+        if linetable is None:
+            self._linetable = gdb.selected_frame().find_sal().symtab.linetable()
+        else:
+            self._linetable = linetable
         self._extract_all_blocks()
         self._build_block_graph()
-        self._disassembly = dict()
         for key, block in self._blocks.items():
-            self._disassembly[key] = map_block(block)
+            self._disassembly[key] = map_block_batched(block)
+        if verbose:
+            self.print_disassembly()
 
-        for key, asmMap in self._disassembly.items():
-            for line, instrs in asmMap.items():
-                for pc, instr in instrs.items():
-                    print(str(line) + "\t" + instr)
+    def print_disassembly(self):
+        for key, blockMap in self._disassembly.items():
+            print(blockMap.format())
 
     def _extract_all_blocks(self):
         for entry in self._linetable:
-            block = gdb.block_for_pc(entry.pc)
+            block = blockindex.block_for_pc(entry.pc)
             self._add_block_to_graph(block)
 
-    def _add_block_to_graph(self, block):
-        key = _block_key(block)
+    def _add_block_vertex(self, block):
+        key = blockindex.block_key(block)
         if key in self._blocks:
-            return None
+            return self._lookupVertex[key]
         self._blocks[key] = block
         v = self._network.add_vertex()
         self._block_property[v] = block
         self._network.vertex_properties.label[v] = self._block_label(key, block)
         self._lookupVertex[key] = v
-        for symbol in block:
-            childV = self._network.add_vertex()
-            self._block_property[childV] = None
-            self._network.vertex_properties.label[childV] = self._symbol_label(symbol)
-            self._network.add_edge(v, childV)
+        return v
+
+    def _add_symbol_vertices(self, key):
+        if key in self._expanded:
+            return
+        self._expanded.add(key)
+        v = self._lookupVertex[key]
+        labels = [self._symbol_label(symbol) for symbol in self._blocks[key]]
+        if not labels:
+            return
+        first = self._network.num_vertices()
+        self._network.add_vertex(len(labels))
+        for i, label in enumerate(labels, first):
+            self._network.vertex_properties.label[self._network.vertex(i)] = label
+        children = numpy.arange(first, first + len(labels), dtype=numpy.int64)
+        self._network.add_edge_list(numpy.column_stack(
+            (numpy.full(len(labels), int(v), dtype=numpy.int64), children)))
+
+    def _add_block_to_graph(self, block):
+        key = blockindex.block_key(block)
+        if key in self._blocks:
+            return None
+        v = self._add_block_vertex(block)
+        self._add_symbol_vertices(key)
         if block.global_block is not None:
             self._add_block_to_graph(block.global_block)
         if block.static_block is not None:
             self._add_block_to_graph(block.static_block)
         return v
 
+    def vertex_for_pc(self, pc):
+        """
+        @return {vertex} the vertex of the innermost block
+        containing pc, adding only that block if it is new.
+        """
+        return self._add_block_vertex(blockindex.block_for_pc(pc))
+
+    def vertex_for_function(self, name):
+        """
+        @return {vertex} the vertex of the outermost block of the
+        function called name.
+        """
+        symbol = gdb.lookup_global_symbol(name)
+        if symbol is None:
+            symbol = gdb.lookup_symbol(name)[0]
+        if symbol is None or not symbol.is_function:
+            raise ValueError("no function named " + name)
+        return self.vertex_for_pc(int(symbol.value().address))
+
+    def expand(self, vertex):
+        """
+        Add the symbols of the block at vertex and the blocks directly
+        nested in it, which are added unexpanded.
+
+        @return {list} the vertices of the nested blocks; empty for symbol
+        vertices, which have nothing to expand.
+        """
+        block = self._block_property[vertex]
+        if block is None:
+            return list()
+        self._add_symbol_vertices(blockindex.block_key(block))
+        children = list()
+        for subblock in blockindex.sub_blocks(block):
+            child = self._add_block_vertex(subblock)
+            self._link(vertex, child)
+            children.append(child)
+        return children
+
+    def parent(self, vertex):
+        """
+        Add the superblock of the block at vertex, unexpanded, and link it.
+
+        @return {vertex} the superblock's vertex, or None for the global
+        block and for symbol vertices.
+        """
+        block = self._block_property[vertex]
+        if block is None or block.superblock is None:
+            return None
+        parent = self._add_block_vertex(block.superblock)
+        self._link(parent, vertex)
+        return parent
+
+    def _link(self, parent, child):
+        if self._network.edge(parent, child) is None:
+            self._network.add_edge(parent, child)
+
+    def disassembly(self, vertex):
+        """
+        @return {BlockMap} the disassembly of the block at vertex, computed
+        on first request.  Symbol vertices have no code of their own and
+        raise ValueError.
+        """
+        block = self._block_property[vertex]
+        if block is None:
+            raise ValueError("vertex %d is a symbol, not a block"
+                             % int(vertex))
+        key = blockindex.block_key(block)
+        if key not in self._disassembly:
+            self._disassembly[key] = map_block_batched(block)
+        return self._disassembly[key]
+
     def _print_all_symbols(self):
         for key, block in self._blocks.items():
             print(self._block_label(key, block))
@@ -91,20 +193,23 @@ class BlockGraph(object):
             return "(?)" + symbol.name
 
     def _build_block_graph(self):
+        edges = list()
         queue = list(self._blocks.items())
         while queue:
             key, block = queue.pop()
             if block.superblock is None:
                 continue
             superblock = block.superblock
-            superblockKey = _block_key(superblock)
+            superblockKey = blockindex.block_key(superblock)
             if superblockKey not in self._blocks:
                 parent = self._add_block_to_graph(superblock)
                 queue.append((superblockKey, superblock))
             else:
                 parent = self._lookupVertex[superblockKey]
             child = self._lookupVertex[key]
-            self._network.add_edge(parent, child)
+            edges.append((int(parent), int(child)))
+        if edges:
+            self._network.add_edge_list(numpy.array(edges, dtype=numpy.int64))
 
     def save(self, filename="blockgraph.dot"):
         self._network.save(filename)
@@ -121,21 +226,70 @@ def disassemble_block(block=None):
     return _arch.disassemble(_block.start, _block.end)
 
 
-def map_block(block=None):
-    disas = disassemble_block(block)
-    lineDict = dict()
-    for entry in disas:
-        sal = gdb.find_pc_line(entry["addr"])
-        if sal.line not in lineDict:
-            lineDict[sal.line] = dict()
-        lineDict[sal.line][sal.pc] = entry["asm"]
-    return lineDict
+class BlockMap(object):
+    """
+    The disassembly of a block with the source line of every instruction.
 
+    addrs, lines and pcs are parallel numpy arrays in address order, pcs
+    holding the start of the line table entry of each instruction; asm holds
+    the instruction text.
+    """
 
+    def __init__(self, addrs, lines, pcs, asm):
+        self.addrs = addrs
+        self.lines = lines
+        self.pcs = pcs
+        self.asm = asm
 
+    def __len__(self):
+        return len(self.addrs)
 
+    def by_line(self):
+        """
+        @return {dict} line -> {line table entry pc: instruction}, as
+        map_block always returned.
+        """
+        lineDict = dict()
+        for pc, line, instr in zip(self.pcs, self.lines, self.asm):
+            lineDict.setdefault(int(line), dict())[int(pc)] = instr
+        return lineDict
 
+    def format(self):
+        return "\n".join(str(line) + "\t" + instr
+                         for line, instr in zip(self.lines, self.asm))
 
 
+def map_block_batched(block=None):
+    """
+    Disassemble block and map every instruction to its line, with one
+    searchsorted per unit line table the block's code lies in.
 
+    Maps are kept in the on-disk debug-info cache of the block's objfile.
 
+    @return {BlockMap}
+    """
+    if block is None:
+        block = gdb.selected_frame().block()
+    cache = blockindex.cache_for_pc(block.start)
+    stored = None
+    if cache is not None:
+        name = "disas-r%x-%x" % (cache.relative(block.start),
+                                 cache.relative(block.end))
+        stored = cache.load_arrays(name)
+    if stored is not None:
+        return BlockMap(cache.absolute(stored["addrs"]), stored["lines"],
+                        cache.absolute(stored["pcs"]), stored["asm"])
+    disas = disassemble_block(block)
+    addrs = numpy.fromiter((entry["addr"] for entry in disas), numpy.uint64,
+                           len(disas))
+    asm = [entry["asm"] for entry in disas]
+    lines, pcs = blockindex.find_lines(addrs)
+    if cache is not None:
+        cache.store(name, {"addrs": cache.relative(addrs), "lines": lines,
+                           "pcs": cache.relative(pcs),
+                           "asm": numpy.array(asm, dtype=numpy.str_)})
+    return BlockMap(addrs, lines, pcs, asm)
+
+
+def map_block(block=None):
+    return map_block_batched(block).by_line()
@@ -1,28 +1,101 @@
 #!/usr/bin/env python
 # -*- encoding UTF-8 -*-
+"""
+Wrappers around gdb.Frame for interactive use and Selector.
+
+MemoryGraph does not go through these: it walks gdb.Frame objects directly,
+and what it saves between snapshots is kept in data.FrameCache.
+"""
 
 import gdb
 
+_UNSET = object()
+
+
+def frame_key(gdbFrame):
+    """
+    @return {tuple} (stack pointer, pc, level) of gdbFrame.  The level is None
+    on gdbs without Frame.level.
+    """
+    try:
+        sp = int(gdbFrame.read_register("sp"))
+    except (gdb.error, ValueError):
+        sp = None
+    level = gdbFrame.level() if hasattr(gdbFrame, "level") else None
+    return (sp, gdbFrame.pc(), level)
+
+
+class FrameRegistry(object):
+    """
+    The Frame wrappers of the current stop.
+
+    gdb.Frame objects do not survive the inferior running, so neither do the
+    wrappers: the registry empties itself on every gdb.events.cont, and the
+    same frame asked for twice within one stop gets the same wrapper.
+    """
+
+    def __init__(self):
+        self._frames = dict()
+
+    def __len__(self):
+        return len(self._frames)
+
+    def clear(self, event=None):
+        self._frames.clear()
+
+    def get(self, gdbFrame):
+        """
+        @return {Frame} the wrapper of gdbFrame, or None if gdbFrame is None.
+        """
+        if gdbFrame is None:
+            return None
+        key = frame_key(gdbFrame)
+        frame = self._frames.get(key)
+        if frame is None or not frame.is_valid():
+            frame = Frame(gdbFrame, key=key)
+            self._frames[key] = frame
+        return frame
+
+    def find(self, description):
+        """
+        @return {Frame} the wrapper described as description, or None.
+        """
+        for frame in self._frames.values():
+            if frame.description == description:
+                return frame
+        return None
+
+
 class Frame(object):
     """
     *Concrete* class to track a frame in the debugee
-    """
-    # TODO: Use finish points to automatically clean up.
 
-    knownFrames = dict()
+    Get these from registry.get rather than building them, so that each
+    stop's frames are shared.  name, function and block are looked up once
+    per wrapper, as are its neighbours.
+    """
 
     def _get_frame(self, gdbFrame=None):
         return gdbFrame if gdbFrame is not None else gdb.selected_frame()
 
-    def __init__(self, gdbFrame):
+    def __init__(self, gdbFrame, key=None):
         self.frame = gdbFrame
-        self.description = str(self.frame)
-        if self.frame.is_valid():
-            self.knownFrames[self.description] = self
+        self.key = key if key is not None else frame_key(gdbFrame)
+        self._description = None
+        self._name = _UNSET
+        self._function = _UNSET
+        self._block = _UNSET
+        self._older = _UNSET
+        self._newer = _UNSET
 
+    @property
+    def description(self):
+        if self._description is None:
+            self._description = str(self.frame)
+        return self._description
 
     def __str__(self):
-        return str(self.frame)
+        return self.description
 
     def __repr__(self):
         return repr(self.frame)
@@ -35,7 +108,9 @@ class Frame(object):
         return self.frame.is_valid()
 
     def name(self):
-        return self.frame.name()
+        if self._name is _UNSET:
+            self._name = self.frame.name()
+        return self._name
 
     def architecture(self):
         return self.frame.architecture()
@@ -50,16 +125,24 @@ class Frame(object):
         return self.frame.pc()
 
     def block(self):
-        return self.frame.block()
+        if self._block is _UNSET:
+            self._block = self.frame.block()
+        return self._block
 
     def function(self):
-        return self.frame.function()
+        if self._function is _UNSET:
+            self._function = self.frame.function()
+        return self._function
 
     def older(self):
-        return Frame(self.frame.older())
+        if self._older is _UNSET:
+            self._older = registry.get(self.frame.older())
+        return self._older
 
     def newer(self):
-        return Frame(self.frame.newer())
+        if self._newer is _UNSET:
+            self._newer = registry.get(self.frame.newer())
+        return self._newer
 
     def find_sal(self):
         return self.frame.find_sal()
@@ -81,11 +164,13 @@ class Selector(object):
 
     def __init__(self, f=None):
         if f is None:
-            self._frame = Frame(gdb.newest_frame())
+            self._frame = registry.get(gdb.newest_frame())
         elif isinstance(f, gdb.Frame):
-            self._frame = Frame(f)
+            self._frame = registry.get(f)
+        elif isinstance(f, Frame):
+            self._frame = f
         elif isinstance(f, str):
-            self._frame = Frame.knownFrames.get(f, Frame(gdb.newest_frame()))
+            self._frame = registry.find(f) or registry.get(gdb.newest_frame())
         else:
             print("Frame param of invalid type!")
             raise ValueError("frame param of invalid type: " + str(type(f)))
@@ -103,3 +188,7 @@ class Selector(object):
     @property
     def frame(self):
         return self._frame
+
+
+registry = FrameRegistry()
+gdb.events.cont.connect(registry.clear)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- encoding UTF-8 -*-
+"""
+Global and static variables as search roots.
+
+gdb has no Python call listing every compilation unit or variable, so the
+declarations printed by "info variables" are parsed for their names, and
+each name is looked up as a symbol of an objfile.  A lookup finds variables
+in data-only units, which have no line table, and a variable declared in a
+header is matched to the "File" heading of that header.  Objfiles are
+resolved once: a new objfile only has its own symbols looked up, although
+"info variables" has to be read again to learn their names.  clear_objfiles
+(a new program) drops everything.
+
+Variables are grouped into contiguous address ranges, so that the .data and
+.bss of an objfile can each be hashed with a handful of reads; the variables
+themselves are still searched one by one.
+"""
+
+import re
+import gdb
+
+_FILE = re.compile(r"^File (.*):$")
+_DECLARATION = re.compile(r"^(?:\d+:)?\s+(.*);$")
+_FUNCTION_POINTER = re.compile(r"\(\s*\*+\s*([\w:]+)\s*\)")
+_ARRAY_SUFFIX = re.compile(r"(?:\s*\[[^\]]*\])+$")
+_NAME = re.compile(r"([\w:]+)$")
+_NON_DEBUGGING = "Non-debugging symbols:"
+
+
+def _execute(command):
+    return gdb.execute(command, to_string=True)
+
+
+def declared_name(declaration):
+    """
+    @param declaration {str} a declaration as "info variables" prints it,
+    without the trailing semicolon.
+    @return {str} the name it declares, or None if none can be made out.
+    """
+    match = _FUNCTION_POINTER.search(declaration)
+    if match is not None:
+        return match.group(1)
+    match = _NAME.search(_ARRAY_SUFFIX.sub("", declaration))
+    return match.group(1) if match is not None else None
+
+
+def parse_info_variables(text):
+    """
+    @return {list} (file name, variable name, is static) for every variable
+    with debug info in "info variables" output.
+    """
+    variables = list()
+    fileName = None
+    for line in text.splitlines():
+        if line.startswith(_NON_DEBUGGING):
+            break
+        match = _FILE.match(line)
+        if match:
+            fileName = match.group(1)
+            continue
+        match = _DECLARATION.match(line)
+        if match is None or fileName is None:
+            continue
+        declaration = match.group(1)
+        name = declared_name(declaration)
+        if name is not None:
+            variables.append((fileName, name,
+                              declaration.startswith("static ")))
+    return variables
+
+
+class GlobalVariable(object):
+
+    __slots__ = ("symbol", "address", "size")
+
+    def __init__(self, symbol, address, size):
+        self.symbol = symbol
+        self.address = address
+        self.size = size
+
+
+class GlobalRoots(object):
+
+    def __init__(self, execute=_execute):
+        self._execute = execute
+        self.reset()
+
+    def reset(self, event=None):
+        self._objfiles = dict()
+        self._pending = None
+
+    def invalidate(self, event=None):
+        objfile = getattr(event, "new_objfile", None)
+        if objfile is None:
+            self._pending = None
+        elif self._pending is not None:
+            self._pending.append(objfile)
+
+    def _declarations(self):
+        try:
+            text = self._execute("info variables -n")
+        except gdb.error:
+            # Older gdbs have no -n; the non-debugging symbols are skipped
+            # by the parser anyway.
+            text = self._execute("info variables")
+        return parse_info_variables(text)
+
+    @staticmethod
+    def _candidates(name, static, objfile):
+        if static and hasattr(gdb, "lookup_static_symbols"):
+            # Every unit may have a static of the same name.
+            return gdb.lookup_static_symbols(name)
+        if objfile is not None:
+            if static and hasattr(objfile, "lookup_static_symbol"):
+                return [objfile.lookup_static_symbol(name)]
+            if not static and hasattr(objfile, "lookup_global_symbol"):
+                return [objfile.lookup_global_symbol(name)]
+        if static:
+            return [gdb.lookup_static_symbol(name)]
+        return [gdb.lookup_global_symbol(name)]
+
+    @classmethod
+    def _lookup(cls, fileName, name, static, objfile=None):
+        """
+        @return {list} the variables called name defined in fileName, by
+        objfile if given.  C++ prints static members as static, but they
+        are global symbols, so the other kind is tried when one finds none.
+        """
+        found = list()
+        for kind in (static, not static):
+            for symbol in cls._candidates(name, kind, objfile):
+                if symbol is None or symbol.symtab is None or \
+                        symbol.symtab.filename != fileName:
+                    continue
+                if objfile is not None and symbol.symtab.objfile != objfile:
+                    continue
+                found.append(symbol)
+            if found:
+                break
+        return found
+
+    def _collect(self, declarations, objfiles=None):
+        """
+        Look the declarations up and file the variables under their objfile.
+
+        @param objfiles {list} look only in these objfiles, one at a time;
+        everywhere at once if None.
+        """
+        wanted = objfiles if objfiles is not None else [None]
+        seen = set()
+        for objfile in wanted:
+            for fileName, name, static in declarations:
+                for symbol in self._lookup(fileName, name, static, objfile):
+                    if not symbol.is_variable or \
+                            symbol.addr_class != gdb.SYMBOL_LOC_STATIC:
+                        continue
+                    try:
+                        val = symbol.value()
+                    except gdb.error:
+                        continue
+                    if val.address is None or val.type.sizeof == 0:
+                        continue
+                    address = int(val.address)
+                    if (address, name) in seen:
+                        continue
+                    seen.add((address, name))
+                    # Keyed by the Objfile itself: two objfiles may share a
+                    # file name, and so may the files within them.
+                    self._objfiles.setdefault(symbol.symtab.objfile, list()) \
+                        .append(GlobalVariable(symbol, address,
+                                               val.type.sizeof))
+
+    def _refresh(self):
+        if self._pending is None:
+            self._objfiles = dict()
+            objfiles = None
+        else:
+            objfiles = [objfile for objfile in self._pending
+                        if objfile.is_valid()]
+            for objfile in objfiles:
+                self._objfiles.pop(objfile, None)
+        self._pending = list()
+        if objfiles == []:
+            return
+        self._collect(self._declarations(), objfiles)
+
+    def variables(self):
+        """
+        @return {list} every GlobalVariable, sorted by address.
+        """
+        if self._pending is None or self._pending:
+            self._refresh()
+        found = dict()
+        for objfile, variables in list(self._objfiles.items()):
+            if not objfile.is_valid():
+                del self._objfiles[objfile]
+                continue
+            for variable in variables:
+                found[(variable.address, variable.symbol.name)] = variable
+        return [found[key] for key in sorted(found)]
+
+    def ranges(self, gap=0):
+        """
+        @return {list} (low, high, variables) for each run of variables at
+        most gap bytes apart.
+        """
+        ranges = list()
+        for variable in self.variables():
+            end = variable.address + variable.size
+            if ranges and variable.address <= ranges[-1][1] + gap:
+                ranges[-1][1] = max(ranges[-1][1], end)
+                ranges[-1][2].append(variable)
+            else:
+                ranges.append([variable.address, end, [variable]])
+        return [tuple(entry) for entry in ranges]
+
+
+roots = GlobalRoots()
+gdb.events.new_objfile.connect(roots.invalidate)
+if hasattr(gdb.events, "clear_objfiles"):
+    gdb.events.clear_objfiles.connect(roots.reset)
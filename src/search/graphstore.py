@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+# -*- encoding UTF-8 -*-
+"""
+Graph backends for MemoryGraph and BlockGraph.
+
+graph_tool takes seconds to import, which every gdb session paid even when
+it only wanted allocation tracking.  ArrayGraph is a small stand-in which
+grows numpy arrays of edges and plain lists or arrays of vertex properties,
+and is converted to a graph_tool.Graph only when an analysis or a save needs
+one.  It implements the part of graph_tool's interface the searches use:
+
+    add_vertex, add_edge, add_edge_list, edge, remove_edge, get_out_edges,
+    get_edges, vertex, vertices, num_vertices, num_edges,
+    new_vertex_property, vertex_properties, save
+
+Vertices and edges are plain ints.  Each vertex keeps the list of its live
+out-edges, so edge, get_out_edges and remove_edge cost O(out-degree).  create
+picks a backend by name; graph_tool is imported the first time it is really
+needed.
+"""
+
+import numpy
+
+BACKENDS = ("array", "graph_tool")
+default = "array"
+
+_OBJECT_TYPES = ("python::object", "object", "string")
+_NUMPY_TYPES = {
+    "bool": numpy.uint8,
+    "uint8_t": numpy.uint8,
+    "int16_t": numpy.int16,
+    "short": numpy.int16,
+    "int32_t": numpy.int32,
+    "int": numpy.int32,
+    "int64_t": numpy.int64,
+    "long": numpy.int64,
+    "long long": numpy.int64,
+    "double": numpy.float64,
+    "float": numpy.float64,
+    "long double": numpy.float64,
+}
+
+
+def _grow(array, size):
+    if size <= len(array):
+        return array
+    grown = numpy.zeros(max(size, 2 * len(array), 16), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class VertexProperty(object):
+    """
+    A vertex property of an ArrayGraph, indexed by vertex.
+    """
+
+    def __init__(self, graph, valueType):
+        self._graph = graph
+        self.valueType = valueType
+        if valueType in _OBJECT_TYPES:
+            self._default = "" if valueType == "string" else None
+            self._values = list()
+        elif valueType in _NUMPY_TYPES:
+            self._default = 0
+            self._values = numpy.zeros(0, dtype=_NUMPY_TYPES[valueType])
+        else:
+            raise ValueError("unsupported property type: " + valueType)
+
+    def value_type(self):
+        return self.valueType
+
+    def _reserve(self, size):
+        if isinstance(self._values, list):
+            if size > len(self._values):
+                self._values.extend(
+                    [self._default] * (size - len(self._values)))
+        else:
+            self._values = _grow(self._values, size)
+
+    def __getitem__(self, vertex):
+        i = int(vertex)
+        if i >= len(self._values):
+            return self._default
+        return self._values[i]
+
+    def __setitem__(self, vertex, value):
+        i = int(vertex)
+        self._reserve(i + 1)
+        self._values[i] = value
+
+    @property
+    def a(self):
+        """
+        @return {numpy.ndarray} a writable view of a numeric property, one
+        entry per vertex.
+        """
+        if isinstance(self._values, list):
+            raise TypeError(self.valueType + " properties have no array")
+        self._reserve(self._graph.num_vertices())
+        return self._values[:self._graph.num_vertices()]
+
+    def get_array(self):
+        return self.a
+
+    def values(self):
+        self._reserve(self._graph.num_vertices())
+        return self._values[:self._graph.num_vertices()]
+
+
+class PropertyDict(dict):
+    """
+    graph_tool style property dictionary, also reachable by attribute.
+    """
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+class ArrayGraph(object):
+
+    def __init__(self, directed=True):
+        self.directed = directed
+        self._vertexCount = 0
+        self._edgeCount = 0
+        self._sources = numpy.zeros(0, dtype=numpy.int64)
+        self._targets = numpy.zeros(0, dtype=numpy.int64)
+        self._alive = numpy.zeros(0, dtype=bool)
+        self._removed = 0
+        self._out = list()
+        self.vertex_properties = PropertyDict()
+        self.vp = self.vertex_properties
+
+    def num_vertices(self):
+        return self._vertexCount
+
+    def num_edges(self):
+        return self._edgeCount - self._removed
+
+    def vertex(self, index):
+        if not 0 <= int(index) < self._vertexCount:
+            raise ValueError("invalid vertex: " + str(index))
+        return int(index)
+
+    def vertices(self):
+        return iter(range(self._vertexCount))
+
+    def add_vertex(self, n=1):
+        """
+        @return {int} the new vertex, or a range of them when n > 1.
+        """
+        first = self._vertexCount
+        self._vertexCount += n
+        self._out.extend([] for i in range(n))
+        if n == 1:
+            return first
+        return range(first, self._vertexCount)
+
+    def _reserve_edges(self, count):
+        size = self._edgeCount + count
+        self._sources = _grow(self._sources, size)
+        self._targets = _grow(self._targets, size)
+        self._alive = _grow(self._alive, size)
+
+    def add_edge(self, source, target):
+        self._reserve_edges(1)
+        edge = self._edgeCount
+        self._sources[edge] = int(source)
+        self._targets[edge] = int(target)
+        self._alive[edge] = True
+        self._edgeCount += 1
+        self._out[int(source)].append(edge)
+        return edge
+
+    def add_edge_list(self, edges):
+        """
+        Add the (source, target) rows of edges at once.
+        """
+        edges = numpy.asarray(edges, dtype=numpy.int64).reshape(-1, 2)
+        count = len(edges)
+        self._reserve_edges(count)
+        end = self._edgeCount + count
+        self._sources[self._edgeCount:end] = edges[:, 0]
+        self._targets[self._edgeCount:end] = edges[:, 1]
+        self._alive[self._edgeCount:end] = True
+        if count:
+            # One list extension per distinct source rather than per edge.
+            order = numpy.argsort(edges[:, 0], kind="mergesort")
+            sources = edges[order, 0]
+            bounds = numpy.concatenate(
+                ([0], numpy.flatnonzero(numpy.diff(sources)) + 1, [count]))
+            index = (order + self._edgeCount).tolist()
+            for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+                self._out[int(sources[start])].extend(index[start:stop])
+        self._edgeCount = end
+
+    def _live(self):
+        n = self._edgeCount
+        return self._sources[:n], self._targets[:n], self._alive[:n]
+
+    def edge(self, source, target):
+        """
+        @return {int} an edge from source to target, or None.
+        """
+        target = int(target)
+        for edge in self._out[int(source)]:
+            if self._targets[edge] == target:
+                return edge
+        return None
+
+    def remove_edge(self, edge):
+        if self._alive[edge]:
+            self._alive[edge] = False
+            self._removed += 1
+            self._out[int(self._sources[edge])].remove(edge)
+
+    def get_edges(self):
+        """
+        @return {numpy.ndarray} (source, target, edge) rows of every edge.
+        """
+        sources, targets, alive = self._live()
+        index = numpy.nonzero(alive)[0]
+        return numpy.column_stack((sources[index], targets[index], index))
+
+    def get_out_edges(self, vertex):
+        """
+        @return {numpy.ndarray} (source, target, edge) rows of the out-edges
+        of vertex.
+        """
+        index = numpy.array(self._out[int(vertex)], dtype=numpy.int64)
+        return numpy.column_stack((self._sources[index], self._targets[index],
+                                   index))
+
+    def new_vertex_property(self, valueType):
+        return VertexProperty(self, valueType)
+
+    def to_graph_tool(self):
+        """
+        @return {graph_tool.Graph} a copy of this graph and its vertex
+        properties.
+        """
+        import graph_tool
+        graph = graph_tool.Graph(directed=self.directed)
+        graph.add_vertex(self._vertexCount)
+        edges = self.get_edges()
+        if len(edges):
+            graph.add_edge_list(edges[:, :2])
+        for name, prop in self.vertex_properties.items():
+            converted = graph.new_vertex_property(prop.valueType)
+            values = prop.values()
+            if isinstance(values, list):
+                for i, value in enumerate(values):
+                    converted[i] = value
+            else:
+                converted.a[:] = values
+            graph.vertex_properties[name] = converted
+        return graph
+
+    def save(self, fileName, fmt="auto"):
+        self.to_graph_tool().save(fileName, fmt=fmt)
+
+
+def create(backend=None, directed=True):
+    """
+    @param backend {str} one of BACKENDS; default if None.
+    @return a new, empty graph.
+    """
+    backend = backend or default
+    if backend == "array":
+        return ArrayGraph(directed=directed)
+    if backend == "graph_tool":
+        import graph_tool
+        return graph_tool.Graph(directed=directed)
+    raise ValueError("unknown graph backend: " + str(backend))
+
+
+def remove_out_edges(graph, vertex):
+    """
+    Remove every out-edge of vertex, from either backend.
+
+    @return {numpy.ndarray} the (source, target) pairs removed.
+    """
+    if isinstance(graph, ArrayGraph):
+        edges = graph.get_out_edges(vertex)
+        for edge in edges[:, 2]:
+            graph.remove_edge(edge)
+        return edges[:, :2]
+    edges = graph.get_out_edges(vertex)
+    for edge in list(graph.vertex(vertex).out_edges()):
+        graph.remove_edge(edge)
+    return edges[:, :2]
+
+
+def to_graph_tool(graph):
+    """
+    @return {graph_tool.Graph} graph, converted if it is an ArrayGraph.
+    """
+    if isinstance(graph, ArrayGraph):
+        return graph.to_graph_tool()
+    return graph
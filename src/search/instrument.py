@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- encoding UTF-8 -*-
+"""
+Counters and timers for the snapshot hot paths.
+
+One Recorder, recorder, is shared by the whole process.  It is disabled by
+default, and then costs one attribute test per counted call: MemoryGraph only
+wraps its species handlers in timers when it is built with recording on, and
+the read and lookup sites check recorder.enabled before counting.  Handlers
+are therefore timed only for graphs built while recording is on, and only
+while it stays on.
+
+Recorded:
+
+* handlers: calls and seconds per MemoryGraph species handler;
+* calls: gdb API calls per category, with the bytes moved by reads;
+* queue: the queue depth, sampled each time a batch of tasks is dequeued:
+  the number of samples, their peak, mean and a histogram by power of two,
+  and the depth over time.  The time series keeps at most QUEUE_SERIES
+  samples; when it fills up every other one is dropped and from then on
+  only every other sample is kept;
+* stops: calls and seconds per breakpoint class for tracking stops.
+"""
+
+import json
+from timeit import default_timer as clock
+
+
+class Recorder(object):
+
+    # The queue depth time series is thinned to stay within this many samples.
+    QUEUE_SERIES = 1024
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.handlers = dict()
+        self.calls = dict()
+        self.bytes = dict()
+        self.queueSamples = 0
+        self.queuePeak = 0
+        self.queueTotal = 0
+        self.queueHistogram = dict()
+        self.queueSeries = list()
+        self._queueStride = 1
+        self.stops = dict()
+        self._start = clock()
+
+    def enable(self):
+        self.reset()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    @staticmethod
+    def _add(table, name, seconds):
+        entry = table.get(name)
+        if entry is None:
+            table[name] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def count(self, category, length=0):
+        self.calls[category] = self.calls.get(category, 0) + 1
+        if length:
+            self.bytes[category] = self.bytes.get(category, 0) + length
+
+    def sample_queue(self, depth):
+        self.queueSamples += 1
+        self.queueTotal += depth
+        self.queuePeak = max(self.queuePeak, depth)
+        # Bucket b holds depths in [2**(b - 1), 2**b).
+        bucket = depth.bit_length()
+        self.queueHistogram[bucket] = self.queueHistogram.get(bucket, 0) + 1
+        if (self.queueSamples - 1) % self._queueStride == 0:
+            self.queueSeries.append((clock() - self._start, depth))
+            if len(self.queueSeries) > self.QUEUE_SERIES:
+                self.queueSeries = self.queueSeries[::2]
+                self._queueStride *= 2
+
+    def queue_mean(self):
+        if self.queueSamples == 0:
+            return 0.0
+        return float(self.queueTotal) / self.queueSamples
+
+    def handler_time(self, name, seconds):
+        self._add(self.handlers, name, seconds)
+
+    def stop_time(self, name, seconds):
+        self._add(self.stops, name, seconds)
+
+    def timed(self, name, function):
+        """
+        @return {function} function, recording its duration under name.
+        """
+        def timed(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.handler_time(name, clock() - start)
+        return timed
+
+    def as_dict(self):
+        def table(entries):
+            return dict((name, {"calls": count, "seconds": seconds})
+                        for name, (count, seconds) in entries.items())
+        return {
+            "handlers": table(self.handlers),
+            "calls": dict(self.calls),
+            "bytes": dict(self.bytes),
+            "queue": {
+                "samples": self.queueSamples,
+                "peak": self.queuePeak,
+                "mean": self.queue_mean(),
+                "histogram": dict((str(bucket), count) for bucket, count
+                                  in self.queueHistogram.items()),
+                "series": [[seconds, depth] for seconds, depth
+                           in self.queueSeries],
+            },
+            "stops": table(self.stops),
+        }
+
+    def save(self, fileName):
+        with open(fileName, "w") as f:
+            json.dump(self.as_dict(), f, indent=2, sort_keys=True)
+
+    def format(self):
+        lines = list()
+        for title, entries in (("handlers", self.handlers),
+                               ("breakpoint stops", self.stops)):
+            lines.append(title + ":")
+            for name, (count, seconds) in sorted(
+                    entries.items(), key=lambda item: -item[1][1]):
+                lines.append("  %-28s %8d calls %10.4f s %10.1f us/call"
+                             % (name, count, seconds,
+                                1e6 * seconds / count))
+        lines.append("gdb calls:")
+        for category, count in sorted(self.calls.items(),
+                                      key=lambda item: -item[1]):
+            line = "  %-28s %8d calls" % (category, count)
+            if category in self.bytes:
+                line += " %12d bytes" % self.bytes[category]
+            lines.append(line)
+        if self.queueSamples:
+            lines.append("queue depth: %d samples, peak %d, mean %.1f"
+                         % (self.queueSamples, self.queuePeak,
+                            self.queue_mean()))
+        return "\n".join(lines)
+
+
+recorder = Recorder()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- encoding UTF-8 -*-
+"""
+Leak detection over tracked heap allocations.
+
+A tracked block is considered unreachable at a snapshot when no memory found
+by a MemoryGraph search lies within its address range, and no void pointer
+found by it points into that range.  The LeakDetector remembers how many
+consecutive snapshots each block has been unreachable for, so that blocks
+which are merely in transit between owners can be told apart from blocks
+which have really been lost.
+
+All of the set arithmetic is done on sorted numpy arrays, so a snapshot costs
+O((blocks + reachable) log reachable) regardless of heap size.
+"""
+
+import numpy
+
+
+def unreachable_mask(starts, sizes, reachable):
+    """
+    @param starts {numpy.ndarray} sorted block start addresses.
+    @param sizes {numpy.ndarray} block sizes matching starts.
+    @param reachable {numpy.ndarray} sorted reachable addresses.
+    @return {numpy.ndarray} boolean mask of blocks with no reachable address
+    in [start, start + size).
+    """
+    lo = numpy.searchsorted(reachable, starts, side="left")
+    hi = numpy.searchsorted(reachable, starts + sizes, side="left")
+    return lo == hi
+
+
+class LeakReport(object):
+    """
+    The unreachable blocks found at one snapshot.
+    """
+
+    def __init__(self, starts, sizes, stops, sites):
+        self.starts = starts
+        self.sizes = sizes
+        self.stops = stops
+        self.sites = sites
+
+    def __len__(self):
+        return len(self.starts)
+
+    def leaks(self, minStops=1):
+        """
+        @return {list} (address, size, stops, site) for each block which has
+        been unreachable for at least minStops consecutive snapshots.
+        """
+        keep = numpy.nonzero(self.stops >= minStops)[0]
+        return [(int(self.starts[i]), int(self.sizes[i]),
+                 int(self.stops[i]), self.sites[i]) for i in keep]
+
+    def total_bytes(self, minStops=1):
+        return int(self.sizes[self.stops >= minStops].sum())
+
+    def format(self, minStops=1, symbolize=None):
+        """
+        Render the report as text, one block per line.
+
+        @param symbolize {callable} optional site -> str conversion.  Sites
+        are reported raw when it is not given.
+        """
+        lines = list()
+        for addr, size, stops, site in self.leaks(minStops):
+            if site is not None and symbolize is not None:
+                site = symbolize(site)
+            lines.append("\t".join([hex(addr), str(size), str(stops),
+                                    str(site)]))
+        return "\n".join(lines)
+
+
+class LeakDetector(object):
+    """
+    Compare a DynamicTracker against successive MemoryGraph snapshots.
+    """
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.snapshots = 0
+        self._starts = numpy.empty(0, dtype=numpy.uint64)
+        self._sizes = numpy.empty(0, dtype=numpy.uint64)
+        self._stops = numpy.empty(0, dtype=numpy.int64)
+
+    def snapshot(self, graph):
+        """
+        Record one snapshot.
+
+        @param graph {MemoryGraph} a graph which has already been searched.
+        @return {LeakReport} the blocks unreachable at this snapshot.
+        """
+        starts, sizes = self.tracker.as_arrays()
+        lost = unreachable_mask(starts, sizes, graph.addresses())
+        starts = starts[lost]
+        sizes = sizes[lost]
+        stops = numpy.ones(len(starts), dtype=numpy.int64)
+        if len(self._starts) and len(starts):
+            # A block keeps its streak only if the same (address, size) was
+            # also unreachable last time.
+            idx = numpy.searchsorted(self._starts, starts)
+            idx = numpy.minimum(idx, len(self._starts) - 1)
+            same = (self._starts[idx] == starts) & (self._sizes[idx] == sizes)
+            stops[same] += self._stops[idx[same]]
+        self._starts, self._sizes, self._stops = starts, sizes, stops
+        self.snapshots += 1
+        sites = [self.tracker.site(int(addr)) for addr in starts]
+        return LeakReport(starts, sizes, stops, sites)
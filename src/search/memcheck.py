@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- encoding UTF-8 -*-
+"""
+Heap knowledge pulled from valgrind's memcheck through vgdb.
+
+Under "target remote | vgdb" memcheck already knows every live heap block and
+where it was allocated.  Rather than stopping on each allocation, Memcheck
+asks for the block list with monitor commands at snapshot time and loads it
+into a DynamicTracker in bulk.  Allocation stacks are interned into a
+StackTable, so sites look the same as those captured by NewTrackingBreak.
+"""
+
+import re
+
+_PREFIX = r"^(?:==\d+==)?\s*"
+# A count, followed by its change since the last leak search in the output
+# of "leak_check increased" and "leak_check changed", e.g. "16 (+16)".
+_COUNT = r"[\d,]+(?: \([+-][\d,]+\))?"
+_LOSS_RECORD = re.compile(
+    _PREFIX + _COUNT + r"(?: \(" + _COUNT + r" direct, " + _COUNT +
+    r" indirect\))? bytes in " + _COUNT +
+    r" blocks are .* in loss record (\d+) of (\d+)")
+_FRAME = re.compile(_PREFIX + r"(?:at|by) (0x[0-9A-Fa-f]+): (.*)")
+_BLOCK = re.compile(_PREFIX + r"(0x[0-9A-Fa-f]+)\[(\d+)\]")
+_POINTER = re.compile(_PREFIX + r"\*(0x[0-9A-Fa-f]+) (?:interior-)?points at")
+
+
+def _execute(command):
+    # Imported here so that the parsers can be used outside of gdb.
+    import gdb
+    return gdb.execute(command, to_string=True)
+
+
+def parse_block_list(text):
+    """
+    Parse the output of "monitor block_list".
+
+    @return {list} (address, size, pcs) for every block, where pcs are the
+    return addresses of the block's loss record with memcheck's own allocator
+    replacement frames removed, or () for indirectly lost blocks.
+    """
+    blocks = list()
+    pcs = list()
+    inHeader = False
+    for line in text.splitlines():
+        match = _LOSS_RECORD.match(line)
+        if match:
+            pcs = list()
+            inHeader = True
+            continue
+        match = _FRAME.match(line)
+        if match and inHeader:
+            if "vg_replace_malloc" not in match.group(2):
+                pcs.append(int(match.group(1), 16))
+            continue
+        match = _BLOCK.match(line)
+        if match:
+            inHeader = False
+            # Indirect blocks belong to another record's allocation stack.
+            site = () if "indirect" in line else tuple(pcs)
+            blocks.append((int(match.group(1), 16), int(match.group(2)),
+                           site))
+    return blocks
+
+
+def parse_loss_record_count(text):
+    """
+    @return {int} the number of loss records in "monitor leak_check" output.
+    """
+    count = 0
+    for line in text.splitlines():
+        match = _LOSS_RECORD.match(line)
+        if match:
+            count = max(count, int(match.group(2)))
+    return count
+
+
+def parse_who_points_at(text):
+    return [int(match.group(1), 16)
+            for match in map(_POINTER.match, text.splitlines()) if match]
+
+
+class Memcheck(object):
+
+    def __init__(self, execute=_execute):
+        self._execute = execute
+
+    def leak_check(self):
+        """
+        Run a full leak search covering every kind of block.
+
+        @return {int} the number of loss records.
+        """
+        text = self._execute("monitor leak_check full reachable any")
+        return parse_loss_record_count(text)
+
+    def block_list(self, records):
+        """
+        @return {list} (address, size, pcs) of every block in loss records
+        1..records.
+        """
+        if records == 0:
+            return list()
+        blocks = parse_block_list(self._execute(
+            "monitor block_list 1.." + str(records) + " unlimited"))
+        if blocks:
+            return blocks
+        # Older valgrinds only accept one loss record at a time.
+        for record in range(1, records + 1):
+            blocks.extend(parse_block_list(self._execute(
+                "monitor block_list " + str(record))))
+        return blocks
+
+    def who_points_at(self, address, length=1):
+        """
+        @return {list} addresses of the words pointing into
+        [address, address + length).
+        """
+        return parse_who_points_at(self._execute(
+            "monitor who_points_at " + hex(address) + " " + str(length)))
+
+    def refresh(self, tracker, stacks=None):
+        """
+        Replace the contents of tracker with memcheck's live blocks.
+
+        @return {int} the number of blocks loaded.
+        """
+        blocks = self.block_list(self.leak_check())
+        tracker.clear()
+        # A block is listed again under each record it is indirectly lost
+        # from; keep the listing which carries its own stack.
+        blocks.sort(key=lambda block: (block[0], not block[2]))
+        for address, size, pcs in blocks:
+            if tracker.is_allocated(address):
+                continue
+            site = stacks.intern(pcs) if stacks is not None and pcs \
+                else None
+            tracker.allocate(address, size, site=site)
+        return len(tracker.allocated)
@@ -5,8 +5,6 @@ import gdb
 import memory.exception
 import collections
 
-import graph_tool.all as gt
-
 class Oracle(object):
 
     _selectedFrame = gdb.selected_frame()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Snapshot several inferior processes at once.
+
+One batch-mode gdb session is started per process, each running snapshot.py
+against its own vgdb (or ptrace attach) connection.  The sessions are run
+from a multiprocessing pool, so wall time scales with the number of cores
+rather than the number of processes.  The per-process graphs are then merged
+into a single graph in which every vertex carries the pid it came from.
+
+This module runs outside of gdb and does not import it.
+"""
+
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+
+SNAPSHOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "snapshot.py")
+
+
+def target_command(pid, vgdb=True):
+    if vgdb:
+        return "target remote | vgdb --pid=" + str(pid)
+    return "attach " + str(pid)
+
+
+def gdb_command(gdb="gdb", script=SNAPSHOT_SCRIPT, args=()):
+    return [gdb, "-batch", "-nx", "-x", script] + list(args)
+
+
+def _snapshot_one(job):
+    pid, output, vgdb, gdb = job
+    env = dict(os.environ)
+    env["MEMORY_ORACLE_TARGET"] = target_command(pid, vgdb)
+    env["MEMORY_ORACLE_OUTPUT"] = output
+    with open(output + ".log", "w") as log:
+        code = subprocess.call(gdb_command(gdb), env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    return pid, output, code
+
+
+def snapshot_processes(pids, directory, vgdb=True, processes=None, gdb="gdb"):
+    """
+    Snapshot every pid in parallel.
+
+    @return {dict} pid -> saved graph path, for the snapshots that succeeded.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    jobs = [(pid, os.path.join(directory, "snapshot-" + str(pid) + ".gt"),
+             vgdb, gdb) for pid in pids]
+    pool = multiprocessing.Pool(processes or multiprocessing.cpu_count())
+    try:
+        results = pool.map(_snapshot_one, jobs)
+    finally:
+        pool.close()
+        pool.join()
+    snapshots = dict()
+    for pid, output, code in results:
+        if code == 0 and os.path.exists(output):
+            snapshots[pid] = output
+        else:
+            print("snapshot of", pid, "failed; see", output + ".log",
+                  file=sys.stderr)
+    return snapshots
+
+
+def merge_snapshots(snapshots, namespace="process"):
+    """
+    Merge saved graphs into one.
+
+    Every vertex property the snapshots saved is carried over.  They are
+    plain columns (addresses, sizes, names, ...), so no snapshot needs gdb to
+    be loaded.
+
+    @param snapshots {dict} namespace value (e.g. pid) -> saved graph path.
+    @param namespace {str} name of the vertex property recording which
+    snapshot a vertex came from.
+    @return {graph_tool.Graph} the merged graph.  Labels are prefixed with
+    the namespace value.
+    """
+    import graph_tool.all
+    merged = graph_tool.Graph(directed=True)
+    owner = merged.new_vertex_property("string")
+    for name, path in sorted(snapshots.items()):
+        graph = graph_tool.load_graph(path)
+        offset = merged.num_vertices()
+        count = graph.num_vertices()
+        if count == 0:
+            continue
+        merged.add_vertex(count)
+        edges = graph.get_edges()
+        if len(edges):
+            merged.add_edge_list(edges[:, :2] + offset)
+        prefix = str(name) + "/"
+        for propName, prop in graph.vertex_properties.items():
+            if propName not in merged.vertex_properties:
+                merged.vertex_properties[propName] = \
+                    merged.new_vertex_property(prop.value_type())
+            target = merged.vertex_properties[propName]
+            for v in graph.vertices():
+                value = prop[v]
+                if propName == "label":
+                    value = prefix + value
+                target[merged.vertex(int(v) + offset)] = value
+        for v in graph.vertices():
+            owner[merged.vertex(int(v) + offset)] = str(name)
+    merged.vertex_properties[namespace] = owner
+    return merged
+
+
+def main(argv):
+    arg_parser = argparse.ArgumentParser(
+        prog=argv[0],
+        description="Snapshot several processes in parallel and merge them.")
+    arg_parser.add_argument("pids", nargs="+", type=int)
+    arg_parser.add_argument("-d", "--directory", default="snapshots",
+                            help="where per-process snapshots are written")
+    arg_parser.add_argument("-o", "--output", default="memorygraph.gt",
+                            help="merged graph file")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None,
+                            help="number of parallel gdb sessions")
+    arg_parser.add_argument("--attach", action="store_true",
+                            help="ptrace attach instead of connecting "
+                                 "through vgdb")
+    arg_parser.add_argument("--gdb", default="gdb")
+    args = arg_parser.parse_args(args=argv[1:])
+
+    snapshots = snapshot_processes(args.pids, args.directory,
+                                   vgdb=not args.attach,
+                                   processes=args.jobs, gdb=args.gdb)
+    if not snapshots:
+        return 1
+    merge_snapshots(snapshots).save(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
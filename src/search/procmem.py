@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- encoding UTF-8 -*-
+"""
+Bulk reads of a stopped local inferior straight from /proc/<pid>/mem.
+
+gdb (and, under vgdb, the remote protocol) is slow at moving large amounts of
+memory.  When the inferior is a local process which gdb has stopped, gdb's
+process may read /proc/<pid>/mem itself.  ProcessMemory does so with pread
+into a reusable buffer and hands out memoryviews of it, validating every
+range against /proc/<pid>/maps first.
+
+gdb remains responsible for types and symbols; only raw bytes come from here.
+"""
+
+import bisect
+import os
+
+
+class UnreadableMemory(Exception):
+    """
+    Raised when a read falls outside the readable mappings of the process.
+    """
+    pass
+
+
+class Mapping(object):
+
+    __slots__ = ("start", "end", "perms", "offset", "path")
+
+    def __init__(self, start, end, perms, offset, path):
+        self.start = start
+        self.end = end
+        self.perms = perms
+        self.offset = offset
+        self.path = path
+
+    @property
+    def readable(self):
+        return self.perms[0] == "r"
+
+    @property
+    def writable(self):
+        return self.perms[1] == "w"
+
+
+def parse_maps(lines):
+    """
+    @param lines {iterable} lines in the format of /proc/<pid>/maps.
+    @return {list} the Mappings they describe, in order.
+    """
+    mappings = list()
+    for line in lines:
+        parts = line.split(None, 5)
+        if len(parts) < 5:
+            continue
+        start, end = parts[0].split("-")
+        path = parts[5].strip() if len(parts) > 5 else ""
+        mappings.append(Mapping(int(start, 16), int(end, 16), parts[1],
+                                int(parts[2], 16), path))
+    return mappings
+
+
+class MemoryMap(object):
+    """
+    The mappings of a process, sorted by start address.
+
+    The mappings are read once; call refresh after the process has run, or
+    let ProcessMemory do so when a read misses them.
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.refresh()
+
+    def refresh(self):
+        with open("/proc/" + str(self.pid) + "/maps") as f:
+            self.mappings = parse_maps(f)
+        self._starts = [mapping.start for mapping in self.mappings]
+
+    def __iter__(self):
+        return iter(self.mappings)
+
+    def find(self, address):
+        """
+        @return {Mapping} the mapping containing address, or None.
+        """
+        i = bisect.bisect_right(self._starts, address) - 1
+        if i >= 0 and address < self.mappings[i].end:
+            return self.mappings[i]
+        return None
+
+    def readable(self, address, length):
+        """
+        @return {bool} whether [address, address + length) lies entirely in
+        readable mappings.
+        """
+        end = address + length
+        while address < end:
+            mapping = self.find(address)
+            if mapping is None or not mapping.readable:
+                return False
+            address = mapping.end
+        return True
+
+
+class ProcessMemory(object):
+
+    def __init__(self, pid, bufferSize=1 << 16):
+        self.pid = pid
+        self.maps = MemoryMap(pid)
+        self._fd = os.open("/proc/" + str(pid) + "/mem", os.O_RDONLY)
+        self._buffer = bytearray(bufferSize)
+        self.bytesRead = 0
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        self.close()
+
+    def read_into(self, address, view):
+        """
+        Fill view (a writable buffer) with the memory at address.
+        """
+        length = len(view)
+        if not self.maps.readable(address, length):
+            # The process may have mapped more memory since the maps were
+            # read, e.g. a new heap arena or a grown stack.
+            self.maps.refresh()
+            if not self.maps.readable(address, length):
+                raise UnreadableMemory(hex(address) + "+" + str(length))
+        done = 0
+        while done < length:
+            if hasattr(os, "preadv"):
+                count = os.preadv(self._fd, [view[done:]], address + done)
+            else:
+                chunk = os.pread(self._fd, length - done, address + done)
+                count = len(chunk)
+                view[done:done + count] = chunk
+            if count <= 0:
+                raise UnreadableMemory(hex(address + done))
+            done += count
+        self.bytesRead += length
+        return view
+
+    def read(self, address, length):
+        """
+        @return {memoryview} the memory at address.  The view shares a buffer
+        with later reads, so copy it if it has to outlive the next call.
+        """
+        if len(self._buffer) < length:
+            self._buffer = bytearray(max(length, 2 * len(self._buffer)))
+        return self.read_into(address, memoryview(self._buffer)[:length])
+
+    def read_bytes(self, address, length):
+        return bytes(self.read(address, length))
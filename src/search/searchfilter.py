@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- encoding UTF-8 -*-
+"""
+Predicates which MemoryGraph applies before it enqueues anything.
+
+A memory which a SearchFilter rejects gets no vertex and is not searched.
+Its own value has already been read to describe it, but nothing reachable
+only through it is read or searched.  The include
+criteria (types, objfiles, ranges) select roots: the variables of frames,
+globals and explicit roots have to match them, but what is reached from a
+root is only held to the exclude criteria, so types="Node" still walks a
+Node's fields and what they point to.  Every criterion is optional:
+
+types / excludeTypes        regexes matched (re.search) against type names.
+objfiles / excludeObjfiles  regexes matched against the shared library an
+                            address or frame pc lies in.  Memory outside
+                            shared libraries (the heap, stacks, the main
+                            program) is never rejected for its objfile.
+ranges / excludeRanges      [low, high) address ranges.  Memories without a
+                            real address are never rejected for it.
+functions / excludeFunctions  regexes matched against frame function names.
+                            A rejected frame stays in the frame chain, but its
+                            variables are not searched.
+maxFanOut                   at most this many elements of an array or heap
+                            block are searched.
+"""
+
+import re
+import gdb
+
+_PAGE_SHIFT = 12
+
+
+def _compile(patterns):
+    if patterns is None:
+        return None
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    return [re.compile(pattern) for pattern in patterns]
+
+
+def _matches(patterns, text):
+    return any(pattern.search(text) for pattern in patterns)
+
+
+class SearchFilter(object):
+
+    def __init__(self, types=None, excludeTypes=None, objfiles=None,
+                 excludeObjfiles=None, ranges=None, excludeRanges=None,
+                 functions=None, excludeFunctions=None, maxFanOut=None):
+        self.types = _compile(types)
+        self.excludeTypes = _compile(excludeTypes)
+        self.objfiles = _compile(objfiles)
+        self.excludeObjfiles = _compile(excludeObjfiles)
+        self.ranges = sorted(ranges) if ranges is not None else None
+        self.excludeRanges = sorted(excludeRanges or ())
+        self.functions = _compile(functions)
+        self.excludeFunctions = _compile(excludeFunctions)
+        self.maxFanOut = maxFanOut
+        self._typeVerdicts = dict()
+        self._solibs = dict()
+        self.rejected = 0
+
+    def _accepts_name(self, name, include, exclude):
+        if include is not None and not _matches(include, name):
+            return False
+        return exclude is None or not _matches(exclude, name)
+
+    def accepts_type(self, typeName, root=True):
+        key = (typeName, root)
+        verdict = self._typeVerdicts.get(key)
+        if verdict is None:
+            verdict = self._accepts_name(typeName,
+                                         self.types if root else None,
+                                         self.excludeTypes)
+            self._typeVerdicts[key] = verdict
+        return verdict
+
+    def _solib(self, address):
+        page = address >> _PAGE_SHIFT
+        if page not in self._solibs:
+            self._solibs[page] = gdb.solib_name(address)
+        return self._solibs[page]
+
+    def accepts_objfile(self, address, root=True):
+        objfiles = self.objfiles if root else None
+        if objfiles is None and self.excludeObjfiles is None:
+            return True
+        solib = self._solib(address)
+        if solib is None:
+            return True
+        return self._accepts_name(solib, objfiles, self.excludeObjfiles)
+
+    def accepts_address(self, address, root=True):
+        if root and self.ranges is not None and \
+                not any(low <= address < high for low, high in self.ranges):
+            return False
+        if any(low <= address < high for low, high in self.excludeRanges):
+            return False
+        return self.accepts_objfile(address, root)
+
+    def accepts_memory(self, typeName, address, root=True):
+        """
+        @param address {int} the memory's address, or None if it has none.
+        @param root {bool} whether the memory is a root, which the include
+        criteria apply to as well as the exclude criteria.
+        """
+        if typeName is not None and not self.accepts_type(typeName, root):
+            self.rejected += 1
+            return False
+        if address is not None and not self.accepts_address(address, root):
+            self.rejected += 1
+            return False
+        return True
+
+    def accepts_frame(self, functionName, pc):
+        if functionName is not None and not self._accepts_name(
+                functionName, self.functions, self.excludeFunctions):
+            return False
+        return self.accepts_objfile(pc)
+
+    def fan_out(self, count):
+        """
+        @return {int} how many of count elements to search.
+        """
+        if self.maxFanOut is None:
+            return count
+        return min(count, self.maxFanOut)
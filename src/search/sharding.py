@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sharded graph walk over a core file.
+
+The roots of the walk are split over N gdb worker processes, all loading the
+same binary and core:
+
+* frames are dealt out by a stable hash of their (function, pc, sp) key;
+* tracked heap blocks are dealt out in contiguous address ranges, so each
+  block has exactly one owning shard.
+
+Each worker keeps its own explored index.  When a worker reaches a heap block
+owned by another shard it leaves a stub vertex and reports the block as a
+(type, address) root for the owner.  The coordinator runs rounds until no new
+cross-shard roots appear; the last round lifts ownership so that the walk
+always terminates.  Finally the partial graphs are merged, and vertices
+describing the same memory in different shards (e.g. a stub and the block
+its owner expanded) become one vertex, which joins up the cross-shard edges.
+
+This module runs outside of gdb and does not import it.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import subprocess
+import sys
+import numpy
+import orchestrate
+
+
+def owner_of(address, starts, sizes, count):
+    """
+    @return {int} the shard owning the heap block containing address, or
+    None if address is not in a tracked block.
+    """
+    if not len(starts):
+        return None
+    i = int(numpy.searchsorted(starts, address, side="right")) - 1
+    if i < 0 or address >= int(starts[i]) + int(sizes[i]):
+        return None
+    return i * count // len(starts)
+
+
+def read_roots(fileName):
+    roots = list()
+    if not os.path.exists(fileName):
+        return roots
+    with open(fileName) as f:
+        for line in f:
+            typeName, _, address = line.rstrip("\n").rpartition("\t")
+            if typeName:
+                roots.append((typeName, int(address)))
+    return roots
+
+
+def write_roots(fileName, roots):
+    with open(fileName, "w") as f:
+        for typeName, address in roots:
+            f.write(typeName + "\t" + str(address) + "\n")
+
+
+class ShardedWalk(object):
+
+    def __init__(self, binary, core, directory, shards, heap=None,
+                 debugger="gdb", maxRounds=4):
+        self.binary = binary
+        self.core = core
+        self.directory = directory
+        self.shards = shards
+        self.heap = heap
+        self.debugger = debugger
+        self.maxRounds = max(maxRounds, 1)
+        if heap is not None:
+            arrays = numpy.load(heap)
+            self._starts, self._sizes = arrays["starts"], arrays["sizes"]
+        else:
+            self._starts = self._sizes = numpy.empty(0, dtype=numpy.uint64)
+        self.outputs = dict()
+
+    def _launch(self, roundNumber, index, roots, final):
+        name = "round" + str(roundNumber) + "-shard" + str(index)
+        output = os.path.join(self.directory, name + ".gt")
+        env = dict(os.environ)
+        env.pop("MEMORY_ORACLE_TARGET", None)
+        env["MEMORY_ORACLE_OUTPUT"] = output
+        env["MEMORY_ORACLE_FRAMES"] = "1" if roundNumber == 0 else "0"
+        if not final:
+            env["MEMORY_ORACLE_SHARD"] = str(index) + "/" + str(self.shards)
+        if self.heap is not None:
+            env["MEMORY_ORACLE_HEAP"] = self.heap
+        if roots:
+            env["MEMORY_ORACLE_ROOTS"] = output + ".roots"
+            write_roots(env["MEMORY_ORACLE_ROOTS"], roots)
+        command = orchestrate.gdb_command(self.debugger,
+                                          args=[self.binary, self.core])
+        with open(output + ".log", "w") as log:
+            worker = subprocess.Popen(command, env=env, stdout=log,
+                                      stderr=subprocess.STDOUT)
+        return (roundNumber, index), output, worker
+
+    def run(self):
+        """
+        Walk the core and merge the shards.
+
+        @return {graph_tool.Graph} the merged graph.
+        """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        pending = dict((index, list()) for index in range(self.shards))
+        dispatched = set()
+        for roundNumber in range(self.maxRounds):
+            final = roundNumber == self.maxRounds - 1 and roundNumber > 0
+            workers = [self._launch(roundNumber, index, pending[index], final)
+                       for index in range(self.shards)
+                       if roundNumber == 0 or pending[index]]
+            pending = dict((index, list()) for index in range(self.shards))
+            for key, output, worker in workers:
+                if worker.wait() != 0 or not os.path.exists(output):
+                    print("shard", key, "failed; see", output + ".log",
+                          file=sys.stderr)
+                    continue
+                self.outputs[key] = output
+                for root in read_roots(output + ".stubs"):
+                    if root in dispatched:
+                        continue
+                    dispatched.add(root)
+                    owner = owner_of(root[1], self._starts, self._sizes,
+                                     self.shards)
+                    pending[owner if owner is not None else 0].append(root)
+            if not any(pending.values()):
+                break
+        return merge_by_identity(self.outputs)
+
+
+# Saved vertex properties which identify a memory, as in Memory.id().
+IDENTITY = ("species", "name", "type_name", "address")
+
+
+def identity_keys(graph):
+    """
+    @return {list} the identity of each vertex of a saved MemoryGraph.
+    Vertices without a real address (address -1) get None, as they can not
+    be matched with anything.
+    """
+    columns = [graph.vertex_properties[name] for name in IDENTITY]
+    keys = list()
+    for v in graph.vertices():
+        key = tuple(column[v] for column in columns)
+        keys.append(key if key[-1] >= 0 else None)
+    return keys
+
+
+def merge_by_identity(snapshots, namespace="shard"):
+    """
+    Merge saved graphs, folding vertices with the same identity (species,
+    name, type and address) into one.
+
+    @param snapshots {dict} namespace value -> saved graph path.
+    @return {graph_tool.Graph} the merged graph.  The namespace property
+    holds the first snapshot each vertex was found in.
+    """
+    import graph_tool.all
+    merged = graph_tool.Graph(directed=True)
+    labels = merged.new_vertex_property("string")
+    owner = merged.new_vertex_property("string")
+    columns = dict((name, merged.new_vertex_property(
+        "string" if name in ("name", "type_name") else "int64_t"))
+        for name in IDENTITY)
+    identity = dict()
+    edges = set()
+    for name, path in sorted(snapshots.items()):
+        graph = graph_tool.load_graph(path)
+        local = numpy.empty(graph.num_vertices(), dtype=numpy.int64)
+        for v, key in zip(graph.vertices(), identity_keys(graph)):
+            if key is None:
+                key = (name, int(v))
+            if key not in identity:
+                target = merged.add_vertex()
+                identity[key] = int(target)
+                for column, prop in columns.items():
+                    prop[target] = graph.vertex_properties[column][v]
+                labels[target] = graph.vertex_properties.label[v]
+                owner[target] = str(name)
+            local[int(v)] = identity[key]
+        for source, target in graph.get_edges()[:, :2]:
+            if local[source] != local[target]:
+                edges.add((local[source], local[target]))
+    if edges:
+        merged.add_edge_list(sorted(edges))
+    for column, prop in columns.items():
+        merged.vertex_properties[column] = prop
+    merged.vertex_properties.label = labels
+    merged.vertex_properties[namespace] = owner
+    return merged
+
+
+def main(argv):
+    arg_parser = argparse.ArgumentParser(
+        prog=argv[0],
+        description="Walk a core file with several gdb processes.")
+    arg_parser.add_argument("binary")
+    arg_parser.add_argument("core")
+    arg_parser.add_argument("-n", "--shards", type=int, default=2)
+    arg_parser.add_argument("--heap",
+                            help="tracked heap blocks saved by "
+                                 "DynamicTracker.save")
+    arg_parser.add_argument("-d", "--directory", default="shards")
+    arg_parser.add_argument("-o", "--output", default="memorygraph.gt")
+    arg_parser.add_argument("--rounds", type=int, default=4)
+    arg_parser.add_argument("--gdb", default="gdb")
+    args = arg_parser.parse_args(args=argv[1:])
+
+    walk = ShardedWalk(args.binary, args.core, args.directory, args.shards,
+                       heap=args.heap, debugger=args.gdb,
+                       maxRounds=args.rounds)
+    walk.run().save(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- encoding UTF-8 -*-
+"""
+gdb script which takes one MemoryGraph snapshot and saves it.
+
+Run as "gdb -batch -nx -x snapshot.py"; the orchestrator passes its settings
+through the environment:
+
+MEMORY_ORACLE_TARGET  gdb command which connects to the inferior, e.g.
+                      "target remote | vgdb --pid=1234" or "attach 1234".
+MEMORY_ORACLE_OUTPUT  file to save the graph to.  Use a .gt extension so that
+                      the vertex properties (address, size, species, type_name,
+                      name) survive the trip back to the orchestrator.
+MEMORY_ORACLE_SHARD   optional "index/count"; only frames and heap blocks in
+                      that shard are searched.  Heap blocks owned by other
+                      shards are written to <output>.stubs.
+MEMORY_ORACLE_HEAP    optional tracked heap blocks saved by
+                      DynamicTracker.save.
+MEMORY_ORACLE_ROOTS   optional file of "type<TAB>address" roots to search.
+MEMORY_ORACLE_FRAMES  "0" to skip the frame chain.
+MEMORY_ORACLE_GLOBALS "0" to skip the global and static variables, which are
+                      otherwise searched along with the frames.
+MEMORY_ORACLE_THREADS "0" to search only the selected thread's frames rather
+                      than every thread's.
+
+When no target is given the inferior is whatever gdb was started on, e.g. a
+core file.
+"""
+
+import os
+import sys
+import gdb
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import data
+import sharding
+
+
+def parse_shard(text):
+    if not text:
+        return None
+    index, count = text.split("/")
+    return int(index), int(count)
+
+
+def take_snapshot(output, shard=None, frames=True, roots=(), threads=True,
+                  globals=True):
+    graph = data.MemoryGraph(shard=shard)
+    graph.search(frames=frames, roots=roots, threads=threads,
+                 globals=frames and globals)
+    graph.save(output)
+    if shard is not None:
+        sharding.write_roots(output + ".stubs", graph.crossShard)
+    return graph
+
+
+if __name__ == "__main__":
+    target = os.environ.get("MEMORY_ORACLE_TARGET")
+    if target:
+        gdb.execute(target)
+    heap = os.environ.get("MEMORY_ORACLE_HEAP")
+    if heap:
+        data.NewTrackingBreak.tracker.load(heap)
+    roots = os.environ.get("MEMORY_ORACLE_ROOTS")
+    take_snapshot(os.environ["MEMORY_ORACLE_OUTPUT"],
+                  parse_shard(os.environ.get("MEMORY_ORACLE_SHARD")),
+                  frames=os.environ.get("MEMORY_ORACLE_FRAMES") != "0",
+                  roots=sharding.read_roots(roots) if roots else (),
+                  threads=os.environ.get("MEMORY_ORACLE_THREADS") != "0",
+                  globals=os.environ.get("MEMORY_ORACLE_GLOBALS") != "0")
+    if target:
+        gdb.execute("detach")
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- encoding UTF-8 -*-
+"""
+Change notifications for a few chosen memories, without full snapshots.
+
+A Watcher puts hardware write watchpoints on as many of its memories as the
+debug registers allow (hardwareLimit, four on x86).  The rest are compared
+against a hash of their contents each time the inferior stops.  A hardware
+hit does stop the inferior, since gdb has to take the trap, but it is handled
+in Python without a user-visible stop: it only appends a Change to a bounded
+ring buffer and lets the inferior continue, so each hit costs one round trip
+to gdb.  The buffer is delivered to the connected callbacks as one batch per
+user-visible stop event, after the hashed memories have been checked.
+
+Memories inside tracked heap blocks are reported once with new=None when
+their block is freed, and are no longer watched after that.
+"""
+
+import collections
+import hashlib
+import gdb
+import numpy
+
+# Hardware watchpoints cover aligned words of this many bytes.
+_WORD = 8
+
+Change = collections.namedtuple("Change", "name address old new stop")
+
+
+class Watch(object):
+
+    __slots__ = ("name", "address", "size", "contents", "digest",
+                 "breakpoint", "block")
+
+    def __init__(self, name, address, size):
+        self.name = name
+        self.address = address
+        self.size = size
+        self.contents = None
+        self.digest = None
+        self.breakpoint = None
+        self.block = None
+
+    @property
+    def registers(self):
+        """
+        @return {int} debug registers needed to watch this memory.
+        """
+        first = self.address // _WORD
+        last = (self.address + self.size - 1) // _WORD
+        return last - first + 1
+
+
+class WatchBreak(gdb.Breakpoint):
+
+    def __init__(self, watcher, watch):
+        super(WatchBreak, self).__init__(
+            "*(unsigned char (*)[" + str(watch.size) + "]) " +
+            hex(watch.address),
+            gdb.BP_WATCHPOINT, gdb.WP_WRITE, internal=True)
+        self.silent = True
+        self.watcher = watcher
+        self.watch = watch
+
+    def stop(self):
+        self.watcher._check(self.watch)
+        return False
+
+
+class Watcher(object):
+
+    def __init__(self, capacity=4096, hardwareLimit=4, tracker=None):
+        self.buffer = collections.deque(maxlen=capacity)
+        self.hardwareLimit = hardwareLimit
+        self.tracker = tracker
+        self.dropped = 0
+        self.stops = 0
+        self._watches = dict()
+        self._registers = 0
+        self._callbacks = list()
+        self._connected = False
+
+    def __len__(self):
+        return len(self._watches)
+
+    def _read(self, watch):
+        return bytes(gdb.selected_inferior().read_memory(watch.address,
+                                                         watch.size))
+
+    def _record(self, watch, old, new):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(Change(watch.name, watch.address, old, new,
+                                  self.stops))
+
+    def _check(self, watch):
+        try:
+            contents = self._read(watch)
+        except gdb.MemoryError:
+            return
+        if contents != watch.contents:
+            self._record(watch, watch.contents, contents)
+            watch.contents = contents
+
+    def _blocks(self):
+        """
+        @return {tuple} (starts, sizes) of the tracked heap blocks, or None.
+        """
+        if self.tracker is None:
+            return None
+        return self.tracker.as_arrays()
+
+    @staticmethod
+    def _block_of(address, blocks):
+        """
+        @param blocks {tuple} as returned by _blocks.
+        @return {int} the start of the tracked heap block holding address, or
+        None.
+        """
+        if blocks is None:
+            return None
+        starts, sizes = blocks
+        i = int(numpy.searchsorted(starts, address, side="right")) - 1
+        if i < 0 or address >= int(starts[i]) + int(sizes[i]):
+            return None
+        return int(starts[i])
+
+    def _try_hardware(self, watch):
+        if self._registers + watch.registers > self.hardwareLimit:
+            return False
+        try:
+            breakpoint = WatchBreak(self, watch)
+        except (gdb.error, RuntimeError):
+            return False
+        if breakpoint.type != gdb.BP_HARDWARE_WATCHPOINT:
+            # gdb fell back to single stepping, which is far worse than
+            # hashing at each stop.
+            breakpoint.delete()
+            return False
+        watch.breakpoint = breakpoint
+        self._registers += watch.registers
+        return True
+
+    def watch(self, address, size, name=None):
+        """
+        Start watching [address, address + size).
+
+        @return {int} address, which identifies the watch.
+        """
+        return self._watch(address, size, name, self._blocks())
+
+    def watch_many(self, memories):
+        """
+        Start watching several memories, looking the tracked heap blocks up
+        once for all of them.
+
+        @param memories {iterable} (address, size, name) triples; name may be
+        None.
+        @return {list} the addresses which identify the watches.
+        """
+        blocks = self._blocks()
+        return [self._watch(address, size, name, blocks)
+                for address, size, name in memories]
+
+    def _watch(self, address, size, name, blocks):
+        self.unwatch(address)
+        watch = Watch(name if name is not None else hex(address),
+                      address, size)
+        watch.contents = self._read(watch)
+        watch.block = self._block_of(address, blocks)
+        if not self._try_hardware(watch):
+            watch.digest = hashlib.sha1(watch.contents).digest()
+        self._watches[address] = watch
+        if not self._connected:
+            gdb.events.stop.connect(self._on_stop)
+            self._connected = True
+        return address
+
+    def watch_value(self, val, name=None):
+        """
+        Watch the memory of val, a gdb.Value with an address.
+        """
+        if val.address is None:
+            raise ValueError("value is not in memory")
+        return self.watch(int(val.address), val.type.sizeof, name=name)
+
+    def unwatch(self, address):
+        watch = self._watches.pop(address, None)
+        if watch is not None and watch.breakpoint is not None:
+            self._registers -= watch.registers
+            if watch.breakpoint.is_valid():
+                watch.breakpoint.delete()
+
+    def close(self):
+        for address in list(self._watches):
+            self.unwatch(address)
+        if self._connected:
+            gdb.events.stop.disconnect(self._on_stop)
+            self._connected = False
+
+    def connect(self, callback):
+        """
+        Deliver each batch of changes to callback(changes).
+        """
+        self._callbacks.append(callback)
+
+    def disconnect(self, callback):
+        self._callbacks.remove(callback)
+
+    def poll(self):
+        """
+        Compare the hashed memories with their last contents, and report
+        memories whose heap block has been freed.
+        """
+        for address, watch in list(self._watches.items()):
+            if watch.block is not None and \
+                    not self.tracker.is_allocated(watch.block):
+                self._record(watch, watch.contents, None)
+                self.unwatch(address)
+                continue
+            if watch.breakpoint is not None:
+                continue
+            try:
+                contents = self._read(watch)
+            except gdb.MemoryError:
+                continue
+            digest = hashlib.sha1(contents).digest()
+            if digest != watch.digest:
+                self._record(watch, watch.contents, contents)
+                watch.contents = contents
+                watch.digest = digest
+
+    def drain(self):
+        """
+        @return {list} the buffered changes, oldest first, emptying the buffer.
+        """
+        changes = list(self.buffer)
+        self.buffer.clear()
+        return changes
+
+    def _on_stop(self, event):
+        self.poll()
+        self.stops += 1
+        if self.buffer and self._callbacks:
+            changes = self.drain()
+            for callback in self._callbacks:
+                callback(changes)
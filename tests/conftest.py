@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+
+import pytest
+
+# The search modules import each other by their flat names, as they do when
+# gdb sources them.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "src", "search"))
+
+
+class Inferior(object):
+    """
+    A test program run under the gdb this python is embedded in.
+
+    The program is compiled without optimization and stopped in its function
+    stop(), with the caller of stop() selected, as if the user had typed
+    "up" there.
+    """
+
+    def __init__(self, gdb, directory):
+        self.gdb = gdb
+        self.directory = directory
+        self.path = None
+
+    def _compile(self, source, cplusplus):
+        name = "program.cc" if cplusplus else "program.c"
+        sourcePath = os.path.join(self.directory, name)
+        with open(sourcePath, "w") as f:
+            f.write(source)
+        self.path = os.path.join(self.directory, "program")
+        command = ["g++" if cplusplus else "gcc", "-g", "-O0", "-pthread",
+                   "-o", self.path, sourcePath]
+        try:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT)
+        except OSError:
+            pytest.skip("no compiler: " + command[0])
+        output = process.communicate()[0]
+        assert process.returncode == 0, output
+
+    def start(self, source, cplusplus=False):
+        self._compile(source, cplusplus)
+        execute = self.gdb.execute
+        execute("set confirm off", to_string=True)
+        execute("set pagination off", to_string=True)
+        execute("file " + self.path, to_string=True)
+        execute("break stop", to_string=True)
+        execute("run", to_string=True)
+        execute("up", to_string=True)
+
+    def resume(self):
+        """
+        Continue to the next call of stop().
+        """
+        self.gdb.execute("continue", to_string=True)
+        self.gdb.execute("up", to_string=True)
+
+    def close(self):
+        if self.gdb.selected_inferior().pid:
+            self.gdb.execute("kill", to_string=True)
+        self.gdb.execute("delete", to_string=True)
+
+
+@pytest.fixture
+def inferior(request, tmpdir):
+    """
+    @return {Inferior} a program to start under gdb; the test is skipped
+    outside gdb's python.
+    """
+    gdb = pytest.importorskip("gdb")
+    program = Inferior(gdb, str(tmpdir))
+    request.addfinalizer(program.close)
+    return program
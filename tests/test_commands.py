@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+# The commands are gdb commands; run these under gdb's own python.
+pytest.importorskip("gdb")
+
+# Importing commands registers them with gdb.
+import commands
+
+WALK = r"""
+#include <stdlib.h>
+
+struct node { long value; struct node *next; };
+
+__attribute__((noinline)) void stop(void) {}
+
+int main(void)
+{
+    struct node *head = 0;
+    int i;
+    for (i = 0; i < 3; ++i) {
+        struct node *n = malloc(sizeof *n);
+        n->value = i;
+        n->next = head;
+        head = n;
+    }
+    stop();
+    return (int) head->value;
+}
+"""
+
+
+class TestOracleWalk(object):
+
+    def test_walk_saves_the_subgraph(self, inferior, tmpdir):
+        graph_tool = pytest.importorskip("graph_tool")
+        inferior.start(WALK)
+        gdb = inferior.gdb
+        fileName = os.path.join(str(tmpdir), "walk.gt")
+        output = gdb.execute("oracle walk head 2 " + fileName,
+                             to_string=True)
+        assert output.startswith("walked 4 memories from head")
+        saved = graph_tool.load_graph(fileName)
+        addresses = set(int(address)
+                        for address in saved.vertex_properties.address.a)
+        assert int(gdb.parse_and_eval("&head->value")) in addresses
+        assert int(gdb.parse_and_eval("head->next")) not in addresses
+
+    @pytest.mark.parametrize("arguments", ["", "head x", "a b c d"])
+    def test_bad_arguments(self, inferior, arguments):
+        inferior.start(WALK)
+        with pytest.raises(inferior.gdb.error):
+            inferior.gdb.execute("oracle walk " + arguments, to_string=True)
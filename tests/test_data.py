@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+import numpy
+import pytest
+
+# data needs gdb's python API; run these under gdb's own python.
+pytest.importorskip("gdb")
+
+import data
+import softdirty
+
+parametrize = pytest.mark.parametrize
+
+
+class TestCoalesce(object):
+
+    @parametrize("ranges, gap, merged", [
+        ([], 0, []),
+        ([(0, 8)], 0, [[0, 8]]),
+        ([(0, 8), (8, 16)], 0, [[0, 16]]),
+        ([(0, 8), (9, 16)], 0, [[0, 8], [9, 16]]),
+        ([(0, 8), (9, 16)], 1, [[0, 16]]),
+        ([(0, 32), (8, 16), (40, 48)], 8, [[0, 48]]),
+        ([(0, 32), (8, 16), (41, 48)], 8, [[0, 32], [41, 48]]),
+    ])
+    def test_coalesce(self, ranges, gap, merged):
+        assert data._coalesce(ranges, gap=gap) == merged
+
+
+def memories(graph):
+    """
+    @return {list} the Memory of every vertex of graph.
+    """
+    graph._flush()
+    props = graph._network.vertex_properties
+    return [props.memories[vertex] for vertex in graph._network.vertices()]
+
+
+def strings(graph):
+    return [mem for mem in memories(graph)
+            if mem.type_code == data.SpeciesIndex.string]
+
+
+STRINGS = r"""
+__attribute__((noinline)) void stop(void) {}
+
+int main(void)
+{
+    const char *greeting = "hello";
+    const char *dangling = (const char *) 16;
+    stop();
+    return greeting[0] == dangling[0];
+}
+"""
+
+
+class TestStrings(object):
+
+    @parametrize("batchPointers", [False, True])
+    def test_string_is_one_vertex(self, inferior, batchPointers):
+        inferior.start(STRINGS)
+        graph = data.MemoryGraph(batchPointers=batchPointers)
+        graph.search()
+        readable = [mem for mem in strings(graph) if not mem.unreadable]
+        assert [(mem.prefix, mem.length) for mem in readable] == \
+            [("hello", 5)]
+
+    @parametrize("batchPointers", [False, True])
+    def test_unreadable_string_is_kept(self, inferior, batchPointers):
+        inferior.start(STRINGS)
+        graph = data.MemoryGraph(batchPointers=batchPointers)
+        graph.search()
+        unreadable = [mem for mem in strings(graph) if mem.unreadable]
+        assert [mem.address for mem in unreadable] == [16]
+        assert unreadable[0].truncated
+
+
+ARRAYS = r"""
+__attribute__((noinline)) void stop(void) {}
+
+int main()
+{
+    int *blocks[3];
+    stop();
+    for (int i = 0; i < 3; ++i)
+        blocks[i] = new int[4];
+    stop();
+    for (int i = 0; i < 3; ++i)
+        delete[] blocks[i];
+    return 0;
+}
+"""
+
+
+class TestTrackAllocations(object):
+
+    def test_one_stop_per_array_new(self, inferior):
+        from instrument import recorder
+        inferior.start(ARRAYS, cplusplus=True)
+        tracker = data.NewTrackingBreak.tracker
+        tracker.clear()
+        breaks = data.track_allocations()
+        recorder.enable()
+        try:
+            inferior.resume()
+            stops = dict((name, count)
+                         for name, (count, _) in recorder.stops.items())
+        finally:
+            recorder.disable()
+            for breakpoint in breaks:
+                breakpoint.delete()
+        assert stops.get("MallocTrackingBreak") == 3
+        assert stops.get("NewTrackingFinishBreak") == 3
+        blocks = [int(inferior.gdb.parse_and_eval("blocks[%d]" % i))
+                  for i in range(3)]
+        assert sorted(tracker.list_addrs()) == sorted(blocks)
+        assert [tracker.allocated[block] for block in blocks] == [16] * 3
+        tracker.clear()
+
+
+def describe(graph):
+    return sorted((mem.address, mem.value) for mem in memories(graph)
+                  if mem.address < data._MAX_ADDRESS)
+
+
+def symbol_reads(search):
+    """
+    @return {int} the symbol values read by search().
+    """
+    from instrument import recorder
+    recorder.enable()
+    try:
+        search()
+        return recorder.calls.get("symbol_value", 0)
+    finally:
+        recorder.disable()
+
+
+FRAMES = r"""
+struct node { int value; struct node *next; };
+typedef struct node *NodeP;
+
+__attribute__((noinline)) void stop(void) {}
+
+int main(void)
+{
+    struct node second = {2, 0};
+    struct node first = {1, &second};
+    NodeP head = &first;
+    int i;
+    for (i = 0; i < 2; ++i) {
+        stop();
+        first.value += 10;
+    }
+    return head->value;
+}
+"""
+
+
+class TestFrameCache(object):
+
+    def test_graphs_have_their_own_cache(self):
+        assert data.MemoryGraph().frameCache is not \
+            data.MemoryGraph().frameCache
+
+    def test_unchanged_frame_is_replayed(self, inferior):
+        inferior.start(FRAMES)
+        cache = data.FrameCache()
+        searched = data.MemoryGraph(frameCache=cache)
+        replayed = data.MemoryGraph(frameCache=cache)
+        searchedReads = symbol_reads(searched.search)
+        replayedReads = symbol_reads(replayed.search)
+        assert replayedReads < searchedReads
+        assert describe(replayed) == describe(searched)
+
+    def test_changed_frame_is_searched_again(self, inferior):
+        inferior.start(FRAMES)
+        cache = data.FrameCache()
+        data.MemoryGraph(frameCache=cache).search()
+        inferior.resume()
+        graph = data.MemoryGraph(frameCache=cache)
+        graph.search()
+        first = int(inferior.gdb.parse_and_eval("&first.value"))
+        assert (first, "int 11") in describe(graph)
+
+
+FRONTIER = r"""
+#include <stdlib.h>
+#include <sys/mman.h>
+
+struct node { long value; struct node *next; };
+
+__attribute__((noinline)) void stop(void) {}
+
+int main(void)
+{
+    struct node *head = 0;
+    struct node *edge, *gone;
+    char *pages;
+    int i;
+    for (i = 0; i < 5; ++i) {
+        struct node *n = malloc(sizeof *n);
+        n->value = i;
+        n->next = head;
+        head = n;
+    }
+    /* edge ends where an unmapped page begins, and gone points into it. */
+    pages = mmap(0, 8192, PROT_READ | PROT_WRITE,
+                 MAP_PRIVATE | MAP_ANONYMOUS, -1, 0);
+    munmap(pages + 4096, 4096);
+    edge = (struct node *) (pages + 4096 - sizeof(struct node));
+    gone = (struct node *) (pages + 4096);
+    edge->value = 42;
+    edge->next = 0;
+    stop();
+    return head->value + edge->value + (gone != 0);
+}
+"""
+
+
+class TestPointerFrontier(object):
+
+    def test_batched_search_finds_the_same_memory(self, inferior):
+        inferior.start(FRONTIER)
+        single = data.MemoryGraph()
+        single.search()
+        batched = data.MemoryGraph(batchPointers=True)
+        batched.search()
+        assert describe(batched) == describe(single)
+
+    def test_unreadable_target_drops_only_itself(self, inferior):
+        inferior.start(FRONTIER)
+        graph = data.MemoryGraph(batchPointers=True)
+        graph.search()
+        found = describe(graph)
+        evaluate = inferior.gdb.parse_and_eval
+        assert (int(evaluate("&edge->value")), "long 42") in found
+        for i in range(5):
+            node = "head" + "->next" * i
+            assert (int(evaluate("&" + node + "->value")),
+                    "long %d" % (4 - i)) in found
+        gone = int(evaluate("gone"))
+        assert gone not in [address for address, _ in found]
+
+
+REFRESH = r"""
+#include <stdlib.h>
+
+struct node { long value; struct node *next; };
+
+__attribute__((noinline)) void stop(void) {}
+
+int main(void)
+{
+    struct node *head = malloc(sizeof *head);
+    head->value = 1;
+    head->next = malloc(sizeof *head->next);
+    head->next->value = 2;
+    head->next->next = 0;
+    stop();
+    /* The second node is leaked. */
+    head->value = 3;
+    head->next = 0;
+    stop();
+    return (int) head->value;
+}
+"""
+
+
+class TestRefresh(object):
+
+    def _refresh(self, inferior):
+        inferior.start(REFRESH)
+        evaluate = inferior.gdb.parse_and_eval
+        graph = data.MemoryGraph()
+        graph.search()
+        head = int(evaluate("&head->value"))
+        tail = int(evaluate("head->next"))
+        assert (tail, "long 2") in describe(graph)
+        inferior.resume()
+        pages = numpy.unique(graph.addresses() // softdirty.PAGE_SIZE)
+        return graph, graph.refresh(pages), head, tail
+
+    def test_changed_value_is_relabelled(self, inferior):
+        graph, changed, head, _ = self._refresh(inferior)
+        assert changed >= 2
+        found = describe(graph)
+        assert (head, "long 3") in found
+        assert (head, "long 1") not in found
+
+    def test_unreachable_memory_is_retired(self, inferior):
+        graph, _, _, tail = self._refresh(inferior)
+        assert tail not in graph.addresses()
+
+
+THREADS = r"""
+#include <pthread.h>
+
+pthread_barrier_t ready;
+
+__attribute__((noinline)) void stop(void) {}
+
+void *worker(void *arg)
+{
+    long workerLocal = 7;
+    pthread_barrier_wait(&ready);
+    pthread_barrier_wait(&ready);
+    return (void *) workerLocal;
+}
+
+int main(void)
+{
+    pthread_t thread;
+    long mainLocal = 5;
+    pthread_barrier_init(&ready, 0, 2);
+    pthread_create(&thread, 0, worker, 0);
+    pthread_barrier_wait(&ready);
+    stop();
+    pthread_barrier_wait(&ready);
+    pthread_join(thread, 0);
+    return (int) mainLocal;
+}
+"""
+
+
+class TestThreads(object):
+
+    def _names(self, graph):
+        return set(mem.name for mem in memories(graph))
+
+    def test_every_thread_is_searched(self, inferior):
+        inferior.start(THREADS)
+        graph = data.MemoryGraph()
+        graph.search(threads=True)
+        assert set(["mainLocal", "workerLocal"]) <= self._names(graph)
+        threads = graph._network.vertex_properties.thread.a
+        assert set(int(thread) for thread in threads) == set([1, 2])
+
+    def test_selected_thread_only_by_default(self, inferior):
+        inferior.start(THREADS)
+        graph = data.MemoryGraph()
+        graph.search()
+        assert "mainLocal" in self._names(graph)
+        assert "workerLocal" not in self._names(graph)
+
+    def test_selection_is_restored(self, inferior):
+        inferior.start(THREADS)
+        gdb = inferior.gdb
+        thread = gdb.selected_thread().num
+        frame = gdb.selected_frame()
+        data.MemoryGraph().search(threads=True)
+        assert gdb.selected_thread().num == thread
+        assert gdb.selected_frame() == frame
+        assert frame.name() == "main"
+
+
+FILTERS = r"""
+struct node { long value; struct node *next; };
+struct other { long payload; };
+
+__attribute__((noinline)) void stop(void) {}
+
+int main(void)
+{
+    struct node second = {2, 0};
+    struct node first = {1, &second};
+    struct other skipped = {9};
+    long plain = 4;
+    stop();
+    return (int) (first.value + skipped.payload + plain);
+}
+"""
+
+
+class TestSearchFilter(object):
+
+    def _search(self, inferior, **criteria):
+        import searchfilter
+        inferior.start(FILTERS)
+        graph = data.MemoryGraph(
+            searchFilter=searchfilter.SearchFilter(**criteria))
+        graph.search()
+        return graph
+
+    def test_types_select_roots_only(self, inferior):
+        graph = self._search(inferior, types=r"\bnode\b")
+        names = set(mem.name for mem in memories(graph))
+        assert set(["first", "second"]) <= names
+        assert "skipped" not in names
+        assert "plain" not in names
+        # The fields of a selected root are searched whatever their type.
+        value = int(inferior.gdb.parse_and_eval("&first.value"))
+        assert (value, "long 1") in describe(graph)
+
+    def test_exclude_types_prune_everywhere(self, inferior):
+        graph = self._search(inferior, excludeTypes=r"^long$")
+        names = set(mem.name for mem in memories(graph))
+        assert set(["first", "second", "skipped"]) <= names
+        assert "plain" not in names
+        value = int(inferior.gdb.parse_and_eval("&first.value"))
+        assert (value, "long 1") not in describe(graph)
+        assert graph.filter.rejected > 0
+
+
+LIST = r"""
+#include <stdlib.h>
+
+struct node { long value; struct node *next; };
+
+__attribute__((noinline)) void stop(void) {}
+
+int main(void)
+{
+    struct node *head = 0;
+    int i;
+    for (i = 0; i < 3; ++i) {
+        struct node *n = malloc(sizeof *n);
+        n->value = i;
+        n->next = head;
+        head = n;
+    }
+    stop();
+    return (int) head->value;
+}
+"""
+
+
+class TestMaxDepth(object):
+
+    def test_walk_stops_at_max_depth(self, inferior):
+        inferior.start(LIST)
+        evaluate = inferior.gdb.parse_and_eval
+        # head, *head, and the fields of *head.
+        graph = data.MemoryGraph(maxDepth=2)
+        graph.search(frames=False, values=[evaluate("head")])
+        addresses = graph.addresses()
+        assert int(evaluate("&head->value")) in addresses
+        assert int(evaluate("head->next")) not in addresses
+        assert len(graph) == 4
+
+    def test_values_are_the_only_roots(self, inferior):
+        inferior.start(LIST)
+        graph = data.MemoryGraph()
+        graph.search(frames=False, values=[inferior.gdb.parse_and_eval(
+            "*head->next")])
+        assert "head" not in set(mem.name for mem in memories(graph))
+        assert len(graph.addresses()) > 0
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import os
+import numpy
+
+import debugcache
+
+INFO_FILES = """\
+Symbols from "/tmp/prog".
+Local core dump file:
+	`/tmp/core', file type elf64-x86-64.
+	0x0000555555554000 - 0x0000555555555000 is load1
+	0x00007ffff7dd3000 - 0x00007ffff7dd4000 is load2
+Local exec file:
+	`/tmp/prog', file type elf64-x86-64.
+	Entry point: 0x555555555040
+	0x0000555555554318 - 0x0000555555554334 is .interp
+	0x0000555555555000 - 0x0000555555555195 is .text
+	0x00007ffff7fc5000 - 0x00007ffff7fc6000 is .text in /lib/ld.so
+	0x00007ffff7fc4000 - 0x00007ffff7fc5000 is .note in /lib/ld.so
+"""
+
+
+def _artifact(root, key, name, size, used):
+    path = os.path.join(root, key, name)
+    os.makedirs(path)
+    with open(os.path.join(path, "a.npy"), "wb") as f:
+        f.write(b"\0" * size)
+    os.utime(path, (used, used))
+    return path
+
+
+class TestParseInfoFiles(object):
+
+    def test_lowest_section_per_file(self):
+        assert debugcache.parse_info_files(INFO_FILES) == {
+            "/tmp/prog": 0x555555554318,
+            "/lib/ld.so": 0x7ffff7fc4000,
+        }
+
+    def test_core_sections_are_left_out(self):
+        text = INFO_FILES.split("Local exec file:")[0]
+        assert debugcache.parse_info_files(text) == {}
+
+
+class TestDebugInfoCache(object):
+
+    def test_relative_and_absolute(self, tmpdir):
+        cache = debugcache.DebugInfoCache("key", str(tmpdir), base=0x1000)
+        addrs = numpy.array([0x1000, 0x1234], dtype=numpy.uint64)
+        assert cache.relative(0x1234) == 0x234
+        assert cache.relative(addrs).tolist() == [0, 0x234]
+        assert cache.absolute(0x234) == 0x1234
+        assert cache.absolute(cache.relative(addrs)).tolist() == \
+            addrs.tolist()
+
+    def test_store_and_load(self, tmpdir):
+        cache = debugcache.DebugInfoCache("key", str(tmpdir))
+        assert cache.load_arrays("lines") is None
+        cache.store("lines", {"pcs": numpy.arange(4, dtype=numpy.uint64)},
+                    meta={"unit": "a.c"})
+        assert cache.has("lines")
+        assert cache.load_arrays("lines")["pcs"].tolist() == [0, 1, 2, 3]
+        assert cache.load_json("lines") == {"unit": "a.c"}
+        cache.clear()
+        assert not cache.has("lines")
+
+
+class TestPrune(object):
+
+    def test_old_artifacts_go_first(self, tmpdir):
+        root = str(tmpdir)
+        old = _artifact(root, "k1", "old", 10, 1000)
+        new = _artifact(root, "k2", "new", 10, 2000)
+        removed = debugcache.prune(root, maxBytes=1 << 20, maxAge=500,
+                                   now=2100)
+        assert removed == 1
+        assert not os.path.exists(old)
+        assert not os.path.exists(os.path.dirname(old))
+        assert os.path.exists(new)
+
+    def test_least_recently_used_go_until_the_rest_fit(self, tmpdir):
+        root = str(tmpdir)
+        paths = [_artifact(root, "k", "a%d" % i, 100, 1000 + i)
+                 for i in range(3)]
+        removed = debugcache.prune(root, maxBytes=150, maxAge=10 ** 6,
+                                   now=2000)
+        assert removed == 2
+        assert [os.path.exists(path) for path in paths] == \
+            [False, False, True]
+
+    def test_missing_root(self, tmpdir):
+        assert debugcache.prune(str(tmpdir.join("none"))) == 0
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+# globalroots hooks gdb's events when imported, so these only run under gdb's
+# own python, e.g. gdb -batch -ex "python import pytest; pytest.main(...)".
+pytest.importorskip("gdb")
+
+import globalroots
+
+parametrize = pytest.mark.parametrize
+
+INFO_VARIABLES = """\
+All defined variables:
+
+File a.c:
+3:	int table[16];
+4:	static const char *names[3];
+5:	void (*handler)(int);
+	static int nolines;
+
+File include/foo.h:
+12:	static int Foo::count;
+13:	static std::map<int, int> m;
+
+Non-debugging symbols:
+0x0000000000004010  __data_start
+"""
+
+
+class TestParseInfoVariables(object):
+
+    def test_declarations(self):
+        assert globalroots.parse_info_variables(INFO_VARIABLES) == [
+            ("a.c", "table", False),
+            ("a.c", "names", True),
+            ("a.c", "handler", False),
+            ("a.c", "nolines", True),
+            ("include/foo.h", "Foo::count", True),
+            ("include/foo.h", "m", True),
+        ]
+
+    def test_non_debugging_symbols_are_ignored(self):
+        text = INFO_VARIABLES.split("Non-debugging")[1]
+        assert globalroots.parse_info_variables(text) == []
+
+    @parametrize("declaration, name", [
+        ("int x", "x"),
+        ("unsigned long counts[4][8]", "counts"),
+        ("int (*table)[4]", "table"),
+        ("static void (**hooks)(void)", "hooks"),
+        ("struct node *Tree::root", "Tree::root"),
+    ])
+    def test_declared_name(self, declaration, name):
+        assert globalroots.declared_name(declaration) == name
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import numpy
+import pytest
+
+import graphstore
+
+
+class TestArrayGraph(object):
+
+    def _graph(self):
+        graph = graphstore.ArrayGraph()
+        graph.add_vertex(4)
+        graph.add_edge_list([(2, 3), (0, 1), (0, 2)])
+        graph.add_edge(0, 3)
+        return graph
+
+    def test_counts(self):
+        graph = self._graph()
+        assert graph.num_vertices() == 4
+        assert graph.num_edges() == 4
+
+    def test_add_vertex_returns_the_new_vertices(self):
+        graph = graphstore.ArrayGraph()
+        assert graph.add_vertex() == 0
+        assert list(graph.add_vertex(3)) == [1, 2, 3]
+
+    def test_edge_lookup(self):
+        graph = self._graph()
+        assert graph.edge(0, 2) == 2
+        assert graph.edge(2, 0) is None
+
+    def test_out_edges(self):
+        graph = self._graph()
+        assert graph.get_out_edges(0).tolist() == \
+            [[0, 1, 1], [0, 2, 2], [0, 3, 3]]
+        assert graph.get_out_edges(1).shape == (0, 3)
+
+    def test_remove_edge(self):
+        graph = self._graph()
+        graph.remove_edge(graph.edge(0, 2))
+        graph.remove_edge(2)
+        assert graph.num_edges() == 3
+        assert graph.edge(0, 2) is None
+        assert graph.get_out_edges(0)[:, 1].tolist() == [1, 3]
+        assert graph.get_edges()[:, :2].tolist() == [[2, 3], [0, 1], [0, 3]]
+
+    def test_remove_out_edges(self):
+        graph = self._graph()
+        removed = graphstore.remove_out_edges(graph, 0)
+        assert sorted(removed[:, 1].tolist()) == [1, 2, 3]
+        assert graph.get_edges()[:, :2].tolist() == [[2, 3]]
+
+    def test_invalid_vertex(self):
+        with pytest.raises(ValueError):
+            self._graph().vertex(4)
+
+    def test_numeric_property(self):
+        graph = self._graph()
+        graph.vp.size = graph.new_vertex_property("int64_t")
+        graph.vp.size.a[:] = numpy.arange(4)
+        graph.add_vertex()
+        assert graph.vp.size.a.tolist() == [0, 1, 2, 3, 0]
+
+    def test_object_property(self):
+        graph = self._graph()
+        label = graph.new_vertex_property("string")
+        label[2] = "two"
+        assert label[2] == "two"
+        assert label[3] == ""
+        with pytest.raises(TypeError):
+            label.a
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            graphstore.create("networkx")
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+import instrument
+
+
+class TestQueueSamples(object):
+
+    def _recorder(self, depths):
+        recorder = instrument.Recorder()
+        recorder.enable()
+        for depth in depths:
+            recorder.sample_queue(depth)
+        return recorder
+
+    def test_summary(self):
+        recorder = self._recorder([1, 3, 2])
+        queue = recorder.as_dict()["queue"]
+        assert queue["samples"] == 3
+        assert queue["peak"] == 3
+        assert queue["mean"] == 2.0
+        assert queue["histogram"] == {"1": 1, "2": 2}
+
+    def test_series_keeps_every_sample_until_full(self):
+        recorder = self._recorder(range(10))
+        assert [depth for _, depth in recorder.queueSeries] == list(range(10))
+
+    def test_series_is_thinned_evenly(self):
+        count = 4 * instrument.Recorder.QUEUE_SERIES + 1
+        recorder = self._recorder(range(count))
+        depths = [depth for _, depth in recorder.queueSeries]
+        assert len(depths) <= instrument.Recorder.QUEUE_SERIES
+        assert depths == list(range(0, count, depths[1]))
+        times = [seconds for seconds, _ in recorder.queueSeries]
+        assert times == sorted(times)
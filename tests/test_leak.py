@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import numpy
+
+import leak
+
+
+def _arrays(*values):
+    return numpy.array(values, dtype=numpy.uint64)
+
+
+class FakeTracker(object):
+
+    def __init__(self, blocks):
+        self.blocks = dict(blocks)
+
+    def as_arrays(self):
+        starts = sorted(self.blocks)
+        return (numpy.array(starts, dtype=numpy.uint64),
+                numpy.array([self.blocks[start] for start in starts],
+                            dtype=numpy.uint64))
+
+    def site(self, address):
+        return None
+
+
+class FakeGraph(object):
+
+    def __init__(self, addresses):
+        self._addresses = _arrays(*addresses)
+
+    def addresses(self):
+        return self._addresses
+
+
+class TestUnreachableMask(object):
+
+    def test_interior_and_start_addresses_reach_a_block(self):
+        mask = leak.unreachable_mask(_arrays(0x100, 0x200, 0x300),
+                                     _arrays(0x10, 0x10, 0x10),
+                                     _arrays(0x100, 0x208))
+        assert mask.tolist() == [False, False, True]
+
+    def test_block_end_is_exclusive(self):
+        mask = leak.unreachable_mask(_arrays(0x100), _arrays(0x10),
+                                     _arrays(0xff, 0x110))
+        assert mask.tolist() == [True]
+
+    def test_nothing_reachable(self):
+        mask = leak.unreachable_mask(_arrays(0x100, 0x200), _arrays(8, 8),
+                                     _arrays())
+        assert mask.tolist() == [True, True]
+
+
+class TestLeakDetector(object):
+
+    def test_streak_grows_while_a_block_stays_unreachable(self):
+        tracker = FakeTracker({0x100: 16, 0x200: 16})
+        detector = leak.LeakDetector(tracker)
+        first = detector.snapshot(FakeGraph([0x200]))
+        second = detector.snapshot(FakeGraph([0x200]))
+        assert [addr for addr, _, _, _ in first.leaks()] == [0x100]
+        assert second.leaks() == [(0x100, 16, 2, None)]
+        assert second.total_bytes(minStops=2) == 16
+
+    def test_streak_resets_once_reachable(self):
+        tracker = FakeTracker({0x100: 16})
+        detector = leak.LeakDetector(tracker)
+        detector.snapshot(FakeGraph([]))
+        assert len(detector.snapshot(FakeGraph([0x104]))) == 0
+        assert detector.snapshot(FakeGraph([])).leaks() == \
+            [(0x100, 16, 1, None)]
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import memcheck
+
+parametrize = pytest.mark.parametrize
+
+BLOCK_LIST = """\
+==21== 16 bytes in 1 blocks are definitely lost in loss record 1 of 2
+==21==    at 0x4C2DB8F: malloc (vg_replace_malloc.c:299)
+==21==    by 0x400537: main (leak.c:5)
+==21== 0x51f8040[16]
+==21== 48 (16 direct, 32 indirect) bytes in 1 blocks are definitely lost in loss record 2 of 2
+==21==    at 0x4C2DB8F: malloc (vg_replace_malloc.c:299)
+==21==    by 0x400557: make (leak.c:9)
+==21==    by 0x400577: main (leak.c:14)
+==21== 0x51f8090[16]
+==21==   0x51f80e0[32] indirect loss record 1
+"""
+
+
+class TestParseBlockList(object):
+
+    def test_blocks_and_sites(self):
+        assert memcheck.parse_block_list(BLOCK_LIST) == [
+            (0x51f8040, 16, (0x400537,)),
+            (0x51f8090, 16, (0x400557, 0x400577)),
+            (0x51f80e0, 32, ()),
+        ]
+
+    def test_empty(self):
+        assert memcheck.parse_block_list("") == []
+
+
+class TestParseLossRecordCount(object):
+
+    @parametrize("header", [
+        "==1== 16 bytes in 1 blocks are definitely lost in loss record 3 of 7",
+        "==1== 1,024 bytes in 2 blocks are still reachable in loss record 3 "
+        "of 7",
+        "==1== 16 (+16) bytes in 1 (+1) blocks are definitely lost in loss "
+        "record 3 of 7",
+        "==1== 48 (+48) (16 (+16) direct, 32 (+32) indirect) bytes in 1 (+1) "
+        "blocks are definitely lost in loss record 3 of 7",
+        "==1== 0 (-16) bytes in 0 (-1) blocks are possibly lost in loss "
+        "record 3 of 7",
+    ])
+    def test_headers(self, header):
+        assert memcheck.parse_loss_record_count(header) == 7
+
+    def test_no_records(self):
+        assert memcheck.parse_loss_record_count(
+            "==1== All heap blocks were freed -- no leaks are possible") == 0
+
+
+class TestParseWhoPointsAt(object):
+
+    def test_pointers(self):
+        text = """\
+==1== Searching for pointers to 0x51f8040
+==1== *0x51f8090 points at 0x51f8040
+==1==  Address 0x51f8090 is 0 bytes inside a block of size 16 alloc'd
+==1== *0x1ffefffd08 interior-points at 4 bytes inside 0x51f8040
+"""
+        assert memcheck.parse_who_points_at(text) == [0x51f8090, 0x1ffefffd08]
+
+
+class TestMemcheck(object):
+
+    def test_refresh_keeps_the_listing_with_a_stack(self):
+        outputs = {
+            "monitor leak_check full reachable any": BLOCK_LIST,
+            "monitor block_list 1..2 unlimited": BLOCK_LIST + """\
+==21== 32 bytes in 1 blocks are indirectly lost in loss record 3 of 3
+==21==    at 0x4C2DB8F: malloc (vg_replace_malloc.c:299)
+==21==    by 0x400567: make (leak.c:10)
+==21== 0x51f80e0[32]
+""",
+        }
+
+        class Tracker(object):
+
+            def __init__(self):
+                self.allocated = dict()
+                self.sites = dict()
+
+            def clear(self):
+                self.allocated.clear()
+
+            def is_allocated(self, address):
+                return address in self.allocated
+
+            def allocate(self, address, size, site=None):
+                self.allocated[address] = size
+                self.sites[address] = site
+
+        class Stacks(object):
+
+            def intern(self, pcs):
+                return pcs
+
+        tracker = Tracker()
+        loaded = memcheck.Memcheck(execute=outputs.get).refresh(tracker,
+                                                                Stacks())
+        assert loaded == 3
+        assert tracker.sites[0x51f80e0] == (0x400567,)
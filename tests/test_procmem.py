@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import ctypes
+import os
+import pytest
+
+import procmem
+
+MAPS = """\
+00400000-00452000 r-xp 00000000 08:02 173521      /usr/bin/dbus-daemon
+00651000-00652000 rw-p 00051000 08:02 173521      /usr/bin/dbus-daemon
+00652000-00655000 rw-p 00000000 00:00 0
+7fff0000-7fff1000 ---p 00000000 00:00 0
+7fff1000-7fff3000 rw-p 00000000 00:00 0           [stack]
+"""
+
+
+def _map(text=MAPS):
+    maps = procmem.MemoryMap.__new__(procmem.MemoryMap)
+    maps.mappings = procmem.parse_maps(text.splitlines())
+    maps._starts = [mapping.start for mapping in maps.mappings]
+    return maps
+
+
+class TestParseMaps(object):
+
+    def test_fields(self):
+        mappings = procmem.parse_maps(MAPS.splitlines())
+        assert len(mappings) == 5
+        first = mappings[0]
+        assert (first.start, first.end) == (0x400000, 0x452000)
+        assert first.perms == "r-xp"
+        assert first.path == "/usr/bin/dbus-daemon"
+        assert mappings[1].offset == 0x51000
+        assert mappings[2].path == ""
+        assert mappings[4].path == "[stack]"
+
+    def test_permissions(self):
+        mappings = procmem.parse_maps(MAPS.splitlines())
+        assert mappings[0].readable and not mappings[0].writable
+        assert not mappings[3].readable
+
+    def test_blank_lines_are_skipped(self):
+        assert procmem.parse_maps(["", "  "]) == []
+
+
+class TestMemoryMap(object):
+
+    def test_find(self):
+        maps = _map()
+        assert maps.find(0x400000).start == 0x400000
+        assert maps.find(0x451fff).start == 0x400000
+        assert maps.find(0x452000) is None
+        assert maps.find(0x100) is None
+
+    def test_readable_across_adjacent_mappings(self):
+        maps = _map()
+        assert maps.readable(0x651ff0, 0x20)
+        assert not maps.readable(0x654ff0, 0x20)
+
+    def test_unreadable_mapping(self):
+        assert not _map().readable(0x7fff0000, 1)
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/maps"),
+                    reason="needs /proc")
+class TestProcessMemory(object):
+
+    def test_read_own_memory(self):
+        buf = ctypes.create_string_buffer(b"memory oracle")
+        with procmem.ProcessMemory(os.getpid()) as memory:
+            assert memory.read_bytes(ctypes.addressof(buf), 13) == \
+                b"memory oracle"
+            assert memory.bytesRead == 13
+
+    def test_unmapped_read(self):
+        with procmem.ProcessMemory(os.getpid()) as memory:
+            with pytest.raises(procmem.UnreadableMemory):
+                memory.read_bytes(0, 16)
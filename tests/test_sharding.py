@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import numpy
+
+import sharding
+
+STARTS = numpy.array([0x100, 0x200, 0x300, 0x400], dtype=numpy.uint64)
+SIZES = numpy.array([0x10, 0x10, 0x10, 0x10], dtype=numpy.uint64)
+
+
+class TestOwnerOf(object):
+
+    def test_blocks_are_dealt_in_contiguous_ranges(self):
+        owners = [sharding.owner_of(int(start), STARTS, SIZES, 2)
+                  for start in STARTS]
+        assert owners == [0, 0, 1, 1]
+
+    def test_interior_address(self):
+        assert sharding.owner_of(0x30f, STARTS, SIZES, 2) == 1
+
+    def test_outside_blocks(self):
+        assert sharding.owner_of(0x310, STARTS, SIZES, 2) is None
+        assert sharding.owner_of(0x50, STARTS, SIZES, 2) is None
+
+    def test_no_blocks(self):
+        empty = numpy.empty(0, dtype=numpy.uint64)
+        assert sharding.owner_of(0x100, empty, empty, 2) is None
+
+    def test_more_shards_than_blocks(self):
+        owners = [sharding.owner_of(int(start), STARTS, SIZES, 8)
+                  for start in STARTS]
+        assert owners == [0, 2, 4, 6]
+
+
+class TestRoots(object):
+
+    def test_round_trip(self, tmpdir):
+        fileName = str(tmpdir.join("roots"))
+        roots = [("struct node", 0x1000), ("int (*)[4]", 0x2000)]
+        sharding.write_roots(fileName, roots)
+        assert sharding.read_roots(fileName) == roots
+
+    def test_missing_file(self, tmpdir):
+        assert sharding.read_roots(str(tmpdir.join("none"))) == []